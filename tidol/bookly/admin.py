@@ -1,13 +1,23 @@
 from django.contrib import admin
 
-from .models import Author, Book, Chapter, Genre, Comment, Review, Bookmark, Follow, History
+from .models import Author, Book, BookStats, Chapter, ChapterContent, Genre, Comment, Review, Bookmark, Follow, History, HomePageSnapshot
+from .models import BookViewBucket, TrendingEntry, ChapterViewDaily, ViewRollupState, ChapterReaderSketch, BookReaderSketch
 
 admin.site.register(Author)
 admin.site.register(Book)
 admin.site.register(Chapter)
+admin.site.register(ChapterContent)
 admin.site.register(Genre)
 admin.site.register(Comment)
 admin.site.register(Review)
 admin.site.register(Bookmark)
 admin.site.register(Follow)
 admin.site.register(History)
+admin.site.register(BookStats)
+admin.site.register(HomePageSnapshot)
+admin.site.register(BookViewBucket)
+admin.site.register(TrendingEntry)
+admin.site.register(ChapterViewDaily)
+admin.site.register(ViewRollupState)
+admin.site.register(ChapterReaderSketch)
+admin.site.register(BookReaderSketch)
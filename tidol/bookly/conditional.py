@@ -0,0 +1,36 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+class Validators:
+    """
+    ETag and Last-Modified of a response, worked out from a few columns
+    before anything is serialized. The ETag is weak: counters such as view
+    counts are left out of it, a 304 may carry slightly older ones.
+    """
+
+    def __init__(self, *parts, last_modified=None, vary=()):
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+        self.etag = f'W/"{digest}"'
+        self.last_modified = int(last_modified.timestamp()) if last_modified else None
+        self.vary = vary
+
+    def not_modified(self, request):
+        """
+        A 304 response when the request's If-None-Match or If-Modified-Since
+        still match, otherwise None.
+        """
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response.headers['ETag'] = self.etag
+        if self.last_modified is not None:
+            response.headers['Last-Modified'] = http_date(self.last_modified)
+        if self.vary:
+            patch_vary_headers(response, self.vary)
+        return response
@@ -0,0 +1,163 @@
+from functools import cached_property
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import OuterRef, Subquery
+from rest_framework import serializers
+
+from .models import Chapter
+from .serializers import BookSerializer, FollowSerializer, HistorySerializer, requested_fields
+
+
+def _model_field(model, source):
+    *relations, name = source.split('.')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _file_url(storage):
+    # FileField.to_representation() of a serializer without a request in its context.
+    def to_representation(name):
+        return storage.url(name) if name else None
+    return to_representation
+
+
+class RowMapper:
+    """
+    Read-only equivalent of `serializer_class(queryset, many=True).data`
+    built from `.values()` rows, without model instances or the per-field
+    get_attribute() walk. The serializer's fields are compiled once: plain
+    fields keep their own to_representation(), related fields read the
+    foreign key column and file fields go straight to the storage.
+    SerializerMethodFields have no column, they need an entry in `computed`
+    mapping the field name to (value paths, function of the row).
+
+    The output matches the serializer used without a request in its context,
+    `manage.py bench_serializers` checks that it renders to the same bytes.
+    only() and for_request() give a mapper for a subset of the fields, which
+    selects only the columns, joins and annotations those fields read.
+    """
+
+    def __init__(self, serializer_class, computed=None, annotations=None, fields=None):
+        self.serializer_class = serializer_class
+        self.computed = computed or {}
+        self.annotations = annotations or {}
+        self.fields = fields
+        self._subsets = {}
+
+    @cached_property
+    def field_names(self):
+        names = list(self.serializer_class().fields)
+        return names if self.fields is None else [name for name in names if name in self.fields]
+
+    def only(self, fields):
+        fields = tuple(name for name in self.field_names if name in fields)
+        if fields not in self._subsets:
+            self._subsets[fields] = RowMapper(self.serializer_class, self.computed, self.annotations, fields)
+        return self._subsets[fields]
+
+    def for_request(self, request):
+        fields = requested_fields(request, self.field_names)
+        return self if fields is None else self.only(fields)
+
+    @cached_property
+    def _compiled(self):
+        model = self.serializer_class.Meta.model
+        # The id is always selected, callers look rows up by it.
+        fields, paths = [], ['id']
+        for name, field in self.serializer_class().fields.items():
+            if self.fields is not None and name not in self.fields:
+                continue
+            if name in self.computed:
+                field_paths, function = self.computed[name]
+                fields.append((name, None, function))
+                paths.extend(field_paths)
+                continue
+            if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name} has no column, add it to `computed`.')
+
+            path = field.source.replace('.', '__')
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                # values() already returns the key.
+                to_representation = None
+            elif isinstance(field, serializers.FileField):
+                to_representation = _file_url(_model_field(model, field.source).storage)
+            else:
+                to_representation = field.to_representation
+            fields.append((name, path, to_representation))
+            paths.append(path)
+        return fields, list(dict.fromkeys(paths))
+
+    def values(self, queryset):
+        """
+        `queryset` reduced to the columns the serializer reads, the rows can
+        still be filtered, ordered and paginated before map().
+        """
+        _, paths = self._compiled
+        annotations = {name: expression for name, expression in self.annotations.items() if name in paths}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*paths)
+
+    def map(self, rows):
+        fields, _ = self._compiled
+        data = []
+        for row in rows:
+            item = {}
+            for name, path, to_representation in fields:
+                if path is None:
+                    item[name] = to_representation(row)
+                    continue
+                # Like Serializer.to_representation(), None is never converted.
+                value = row[path]
+                item[name] = value if value is None or to_representation is None else to_representation(value)
+            data.append(item)
+        return data
+
+    def serialize(self, queryset):
+        return self.map(self.values(queryset))
+
+
+def _book_lastupdated(row):
+    latest_chapter_update = row['stats__latest_chapter_update']
+    if latest_chapter_update:
+        return max(row['lastupdated'], latest_chapter_update)
+    return row['lastupdated']
+
+
+book_rows = RowMapper(BookSerializer, computed={
+    'cover': (['cover'], lambda row: row['cover'] or ''),
+    'viewcount': (['stats__view_count'], lambda row: row['stats__view_count'] or 0),
+    'number_of_chapters': (['stats__chapter_count'], lambda row: row['stats__chapter_count'] or 0),
+    'lastupdated': (['lastupdated', 'stats__latest_chapter_update'], _book_lastupdated),
+})
+
+history_rows = RowMapper(HistorySerializer)
+
+
+_latest_chapter = Chapter.objects.filter(book=OuterRef('book')).order_by('-lastupdated', '-pk')
+LATEST_CHAPTER_FIELDS = {
+    'chapter_id': 'id',
+    'chapter_number': 'chapter_number',
+    'chapter_title': 'title',
+    'lastupdated': 'lastupdated',
+}
+
+
+def _follow_latest_chapter(row):
+    if row['latest_chapter_id'] is None:
+        return None
+    return {key: row[f'latest_chapter_{column}'] for key, column in LATEST_CHAPTER_FIELDS.items()}
+
+
+follow_rows = RowMapper(
+    FollowSerializer,
+    computed={
+        'latest_chapter': ([f'latest_chapter_{column}' for column in LATEST_CHAPTER_FIELDS.values()],
+                           _follow_latest_chapter),
+    },
+    annotations={
+        f'latest_chapter_{column}': Subquery(_latest_chapter.values(column)[:1])
+        for column in LATEST_CHAPTER_FIELDS.values()
+    },
+)
@@ -0,0 +1,152 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Genre
+
+
+def _bitmap(ids):
+    # One bit per book id: bit n is set when book n is in the set.
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for book_id in ids:
+        bits[book_id >> 3] |= 1 << (book_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitmap_ids(bitmap, after=None, limit=None):
+    """
+    The book ids of `bitmap` in increasing order, only those greater than
+    `after` and at most `limit` of them.
+    """
+    base = 0
+    if after is not None:
+        base = after + 1
+        bitmap >>= base
+    ids = []
+    while bitmap and (limit is None or len(ids) < limit):
+        lowest = bitmap & -bitmap
+        ids.append(base + lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return ids
+
+
+class GenreIndex:
+    """
+    In-memory membership bitmaps of the Genre.books relation, one Python int
+    per genre with a bit set for each of its book ids, so that combining
+    genres (AND/OR/NOT) and counting facets are a few big-integer operations
+    instead of one join per genre. Kept current by the m2m_changed, Genre and
+    Book signal handlers and reloaded periodically to pick up changes made
+    by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bitmaps = {}
+        self._names = {}
+        self._loaded_at = None
+
+    def load(self):
+        names = dict(Genre.objects.values_list('id', 'name'))
+        members = {genre_id: [] for genre_id in names}
+        for genre_id, book_id in Genre.books.through.objects.values_list('genre_id', 'book_id').iterator(chunk_size=10000):
+            members.setdefault(genre_id, []).append(book_id)
+        bitmaps = {genre_id: _bitmap(ids) for genre_id, ids in members.items()}
+        with self._lock:
+            self._names, self._bitmaps = names, bitmaps
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > settings.GENRE_INDEX_RELOAD_INTERVAL:
+            self.load()
+
+    def set_genre(self, genre_id, name):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._names[genre_id] = name
+                self._bitmaps.setdefault(genre_id, 0)
+
+    def remove_genre(self, genre_id):
+        with self._lock:
+            self._names.pop(genre_id, None)
+            self._bitmaps.pop(genre_id, None)
+
+    def add(self, genre_ids, book_ids):
+        """
+        Add every book of `book_ids` to every genre of `genre_ids`.
+        """
+        books = _bitmap(book_ids)
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for genre_id in genre_ids:
+                self._bitmaps[genre_id] = self._bitmaps.get(genre_id, 0) | books
+
+    def discard(self, genre_ids, book_ids):
+        """
+        Remove the books of `book_ids` from the genres of `genre_ids`, or
+        from every genre when `genre_ids` is None.
+        """
+        books = _bitmap(book_ids)
+        with self._lock:
+            for genre_id in (list(self._bitmaps) if genre_ids is None else genre_ids):
+                if genre_id in self._bitmaps:
+                    self._bitmaps[genre_id] &= ~books
+
+    def clear(self, genre_id):
+        with self._lock:
+            if genre_id in self._bitmaps:
+                self._bitmaps[genre_id] = 0
+
+    def genres(self):
+        """
+        {genre id: name} of every genre.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._names)
+
+    def match(self, all_of=(), any_of=(), none_of=()):
+        """
+        Bitmap of the books in every genre of `all_of`, at least one genre of
+        `any_of` and none of `none_of`. Empty lists do not filter, with no
+        genres at all every book in some genre matches. Unknown genre ids
+        raise KeyError.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            bitmaps = self._bitmaps
+            for genre_id in (*all_of, *any_of, *none_of):
+                if genre_id not in bitmaps:
+                    raise KeyError(genre_id)
+            if any_of:
+                result = 0
+                for genre_id in any_of:
+                    result |= bitmaps[genre_id]
+            elif all_of:
+                result = bitmaps[all_of[0]]
+            else:
+                result = 0
+                for bitmap in bitmaps.values():
+                    result |= bitmap
+            for genre_id in all_of:
+                result &= bitmaps[genre_id]
+            for genre_id in none_of:
+                result &= ~bitmaps[genre_id]
+            return result
+
+    def facets(self, bitmap):
+        """
+        {genre id: number of the books of `bitmap` in that genre}, for the
+        genres with at least one.
+        """
+        with self._lock:
+            counts = {genre_id: (genre_bitmap & bitmap).bit_count() for genre_id, genre_bitmap in self._bitmaps.items()}
+        return {genre_id: count for genre_id, count in counts.items() if count}
+
+
+genre_index = GenreIndex()
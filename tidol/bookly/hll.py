@@ -0,0 +1,55 @@
+import hashlib
+import math
+
+
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+
+# Relative standard error of count(), about 3.25% with 1024 registers.
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter (Flajolet et al.) with 2^PRECISION one-byte
+    registers, so a sketch serializes to 1 KiB whatever it has seen. Sketches
+    merge losslessly: the merge of two sketches equals the sketch of the union.
+    """
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers is not None else bytearray(REGISTERS)
+        if len(self.registers) != REGISTERS:
+            raise ValueError(f'A sketch has {REGISTERS} registers, got {len(self.registers)}.')
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - PRECISION)
+        remainder = hashed & ((1 << (64 - PRECISION)) - 1)
+        rank = (64 - PRECISION) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+        estimate = alpha * REGISTERS * REGISTERS / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Small range correction: linear counting is more accurate here.
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
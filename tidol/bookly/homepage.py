@@ -0,0 +1,99 @@
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .fastpath import book_rows
+from .models import Book, HomePageSnapshot
+from .renderers import FastJSONRenderer
+from .spotlight import sampler
+from .trending import get_trending
+
+logger = logging.getLogger(__name__)
+
+MAX_NUMBER = 50
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def build_homepage(number):
+    """
+    Compute the homepage sections. This is the expensive part and only runs
+    from refresh_snapshot(), never directly on a request. The spotlight is
+    not part of the snapshot, see get_spotlight().
+    """
+    query_set = Book.objects.all()
+
+    last_updated_books = query_set.filter(
+        stats__latest_chapter_update__isnull=False
+    ).order_by('-stats__latest_chapter_update', 'id')[:number]
+    popular_books = query_set.order_by(F('stats__view_count').desc(nulls_last=True), 'id')[:number]
+    last_added_books = query_set.filter(
+        stats__first_chapter_created__isnull=False
+    ).order_by('stats__first_chapter_created', 'id')[:number]
+
+    data = {
+        'last_updated_books': book_rows.serialize(last_updated_books),
+        'popular_books': book_rows.serialize(popular_books),
+        'last_added_books': book_rows.serialize(last_added_books),
+        'trending_books': book_rows.map(get_trending(number, queryset=book_rows.values(query_set))),
+    }
+    # Round-trip through the API renderer so the stored JSON matches what the endpoint used to send.
+    return json.loads(FastJSONRenderer().render(data))
+
+
+def get_spotlight(number):
+    return book_rows.map(sampler.get_books(number, book_rows.values(Book.objects.all())))
+
+
+def refresh_snapshot(number):
+    snapshot, _ = HomePageSnapshot.objects.update_or_create(
+        number=number,
+        defaults={'data': build_homepage(number), 'generated_at': timezone.now(), 'is_stale': False},
+    )
+    return snapshot
+
+
+def mark_stale():
+    HomePageSnapshot.objects.filter(is_stale=False).update(is_stale=True)
+
+
+def _refresh_in_background(number):
+    try:
+        refresh_snapshot(number)
+    except Exception:
+        logger.exception('Failed to refresh homepage snapshot %s', number)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(number)
+        close_old_connections()
+
+
+def schedule_refresh(number):
+    """
+    Rebuild a snapshot on a background thread, at most one rebuild per number at a time.
+    """
+    with _refreshing_lock:
+        if number in _refreshing:
+            return
+        _refreshing.add(number)
+    threading.Thread(target=_refresh_in_background, args=(number,), daemon=True).start()
+
+
+def get_snapshot(number):
+    """
+    Return the stored snapshot for `number`. Only the very first request for a
+    number builds it synchronously; stale or expired snapshots are still served
+    while a rebuild runs in the background.
+    """
+    snapshot = HomePageSnapshot.objects.filter(number=number).first()
+    if snapshot is None:
+        return refresh_snapshot(number)
+    if snapshot.is_stale or snapshot.age() > settings.HOMEPAGE_SNAPSHOT_MAX_AGE:
+        schedule_refresh(number)
+    return snapshot
@@ -0,0 +1,322 @@
+import codecs
+import posixpath
+import re
+import time
+import zipfile
+from collections import namedtuple
+from decimal import Decimal
+from html.parser import HTMLParser
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.db import transaction
+
+from . import homepage, search
+from .models import BookStats, Chapter, ChapterContent
+
+TEXT, MARKDOWN, EPUB = 'text', 'markdown', 'epub'
+FORMATS = {'.txt': TEXT, '.md': MARKDOWN, '.markdown': MARKDOWN, '.epub': EPUB}
+
+# "Chương 12: Tên chương", "Chapter 3 - Title", "Hồi 7"
+HEADING_RE = re.compile(r'(?:chương|chuong|chapter|hồi|hoi)\s+(\d{1,14}(?:\.\d{1,2})?)(?!\w)\s*[:.\-–—]?\s*(.*)', re.I)
+MARKDOWN_HEADING_RE = re.compile(r'#{1,2}\s+(.*?)\s*#*')
+
+CONTAINER_NS = '{urn:oasis:names:tc:opendocument:xmlns:container}'
+OPF_NS = '{http://www.idpf.org/2007/opf}'
+TITLE_MAX_LENGTH = Chapter._meta.get_field('title').max_length
+READ_SIZE = 64 * 1024
+
+# A chapter read from the source, `number` is None when it has none.
+ParsedChapter = namedtuple('ParsedChapter', 'number title content')
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def guess_format(name):
+    return FORMATS.get(posixpath.splitext(name.lower())[1])
+
+
+def _heading(text):
+    """
+    (number, title) of a chapter heading, the number is None when the
+    heading has none.
+    """
+    match = HEADING_RE.fullmatch(text)
+    if match is None:
+        return None, text
+    return Decimal(match[1]), match[2] or text
+
+
+def _chapter(number, title, lines):
+    content = '\n'.join(lines).strip('\n')
+    if not content.strip():
+        return None
+    if not title:
+        title = content.lstrip().split('\n', 1)[0].strip()
+    return ParsedChapter(number, title, content)
+
+
+def _too_large():
+    return InvalidImport(f'More than {settings.IMPORT_MAX_SIZE} bytes of text.')
+
+
+def _chunks(source):
+    size = 0
+    for chunk in iter(lambda: source.read(READ_SIZE), b''):
+        size += len(chunk)
+        if size > settings.IMPORT_MAX_SIZE:
+            raise _too_large()
+        yield chunk
+
+
+def _lines(source):
+    """
+    The lines of a UTF-8 `source`, read in chunks so that neither the file
+    nor a line without an end is ever read past IMPORT_MAX_SIZE.
+    """
+    pending = []
+    for text in codecs.iterdecode(_chunks(source), 'utf-8-sig'):
+        *lines, rest = text.split('\n')
+        if lines:
+            lines[0] = ''.join(pending) + lines[0]
+            pending = []
+            for line in lines:
+                yield line.rstrip('\r')
+        pending.append(rest)
+    last = ''.join(pending)
+    if last:
+        yield last.rstrip('\r')
+
+
+def parse_text(source):
+    """
+    Chapters of a UTF-8 text file, starting at lines such as "Chương 12:
+    Title" or "Chapter 3". Text before the first of them is chapter 0,
+    titled after its first line, and a file without any is one chapter.
+    """
+    number, title, lines = None, '', []
+    for line in _lines(source):
+        # Longer lines are prose that happens to start like a heading.
+        heading = HEADING_RE.fullmatch(line.strip()) if len(line) <= TITLE_MAX_LENGTH else None
+        if heading is None:
+            lines.append(line)
+            continue
+        chapter = _chapter(number if number is not None else Decimal(0), title, lines)
+        if chapter is not None:
+            yield chapter
+        number, title = _heading(line.strip())
+        lines = []
+    chapter = _chapter(number, title, lines)
+    if chapter is not None:
+        yield chapter
+
+
+def parse_markdown(source):
+    """
+    Chapters of a Markdown file, one per level 1 or 2 heading, numbered
+    when the heading reads like "Chương 12: Title". The Markdown is kept
+    as is. Headings without text under them, such as the book title right
+    before the first chapter, are skipped.
+    """
+    number, title, lines = None, '', []
+    fenced = False
+    for line in _lines(source):
+        if line.lstrip().startswith('```'):
+            fenced = not fenced
+        heading = None if fenced else MARKDOWN_HEADING_RE.fullmatch(line)
+        if heading is None:
+            lines.append(line)
+            continue
+        chapter = _chapter(number, title, lines)
+        if chapter is not None:
+            yield chapter
+        number, title = _heading(heading[1])
+        lines = []
+    chapter = _chapter(number, title, lines)
+    if chapter is not None:
+        yield chapter
+
+
+class _XHTMLText(HTMLParser):
+    """
+    The text of an XHTML document, one paragraph per block element, and its
+    first h1-h3 heading (or its <title>), which is left out of the text.
+    """
+    BLOCKS = {'p', 'div', 'br', 'li', 'tr', 'blockquote', 'section', 'article', 'pre', 'hr',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+    SKIPPED = {'head', 'script', 'style'}
+    HEADINGS = {'h1', 'h2', 'h3'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs, self.current = [], []
+        self.title, self.heading = '', None
+        self.in_title = False
+        self.skipped = 0
+
+    def end_paragraph(self):
+        text = ' '.join(''.join(self.current).split())
+        if text:
+            self.paragraphs.append(text)
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title':
+            self.in_title = True
+        elif tag in self.SKIPPED:
+            self.skipped += 1
+        elif tag in self.BLOCKS:
+            self.end_paragraph()
+            if tag in self.HEADINGS and self.heading is None:
+                self.heading = len(self.paragraphs)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCKS:
+            self.end_paragraph()
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        elif tag in self.SKIPPED:
+            self.skipped = max(self.skipped - 1, 0)
+        elif tag in self.BLOCKS:
+            self.end_paragraph()
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif not self.skipped:
+            self.current.append(data)
+
+    def result(self):
+        """
+        (title, text) of the document.
+        """
+        self.close()
+        self.end_paragraph()
+        paragraphs, title = self.paragraphs, ' '.join(self.title.split())
+        if self.heading is not None and self.heading < len(paragraphs):
+            title = paragraphs.pop(self.heading)
+        return title, '\n\n'.join(paragraphs)
+
+
+def parse_epub(source):
+    """
+    Chapters of an EPUB archive, one per XHTML document of the spine, in
+    reading order. Documents without text, like covers, are skipped. At most
+    IMPORT_MAX_SIZE bytes are decompressed, going by the sizes recorded in
+    the archive, which zipfile does not read past.
+    """
+    budget = settings.IMPORT_MAX_SIZE
+
+    def read(archive, name):
+        nonlocal budget
+        info = archive.getinfo(name)
+        budget -= info.file_size
+        if budget < 0:
+            raise _too_large()
+        return archive.read(info)
+
+    try:
+        with zipfile.ZipFile(source) as archive:
+            container = ElementTree.fromstring(read(archive, 'META-INF/container.xml'))
+            rootfile = container.find(f'.//{CONTAINER_NS}rootfile')
+            if rootfile is None:
+                raise InvalidImport('The EPUB has no package document.')
+            package_path = rootfile.get('full-path')
+            package = ElementTree.fromstring(read(archive, package_path))
+            manifest = {item.get('id'): item for item in package.iter(f'{OPF_NS}item')}
+            base = posixpath.dirname(package_path)
+            for itemref in package.iter(f'{OPF_NS}itemref'):
+                item = manifest.get(itemref.get('idref'))
+                if (item is None or itemref.get('linear') == 'no'
+                        or item.get('media-type') not in ('application/xhtml+xml', 'text/html')):
+                    continue
+                href = item.get('href')
+                if not href:
+                    raise InvalidImport(f'The EPUB manifest item "{item.get("id")}" has no href.')
+                parser = _XHTMLText()
+                parser.feed(read(archive, posixpath.normpath(posixpath.join(base, unquote(href)))).decode('utf-8'))
+                title, text = parser.result()
+                number, title = _heading(title) if title else (None, '')
+                chapter = _chapter(number, title, [text])
+                if chapter is not None:
+                    yield chapter
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as error:
+        raise InvalidImport(f'Not a valid EPUB archive: {error}')
+
+
+PARSERS = {TEXT: parse_text, MARKDOWN: parse_markdown, EPUB: parse_epub}
+
+
+def _number_chapters(book, parsed):
+    """
+    Number the chapters of `parsed` and check them against each other and the
+    chapters already in `book`, as the unique_chapter_number constraint would.
+    Chapters without a number follow the previous one.
+    """
+    existing = set(Chapter.objects.filter(book=book).values_list('chapter_number', flat=True))
+    taken = set()
+    last = max(existing, default=Decimal(0))
+    for count, (number, title, content) in enumerate(parsed, 1):
+        if count > settings.IMPORT_MAX_CHAPTERS:
+            raise InvalidImport(f'More than {settings.IMPORT_MAX_CHAPTERS} chapters.')
+        if number is None:
+            number = Decimal(int(last) + 1)
+        if number in existing:
+            raise InvalidImport(f'Chapter {number} ("{title}") is already in the book.')
+        if number in taken:
+            raise InvalidImport(f'Chapter {number} ("{title}") is in the file twice.')
+        taken.add(number)
+        last = number
+        chapter = Chapter(book=book, chapter_number=number, title=title[:TITLE_MAX_LENGTH])
+        chapter.content = content
+        yield chapter
+
+
+def import_chapters(book, source, format, batch_size=500):
+    """
+    Add the chapters of `source`, a binary file in `format` (TEXT, MARKDOWN or
+    EPUB), to `book`. All of them are added or, when one is invalid, none:
+    InvalidImport says why.
+
+    The source is parsed as it is read and inserted `batch_size` chapters at a
+    time with bulk_create(), which sends no signals, so the book stats, search
+    index and homepage are updated here instead. Returns {'chapters',
+    'first_chapter', 'last_chapter', 'seconds', 'chapters_per_second'}.
+    """
+    if format not in PARSERS:
+        raise InvalidImport(f'Unknown file format, expected one of {", ".join(PARSERS)}.')
+    start = time.perf_counter()
+    count, first, last = 0, None, None
+    try:
+        with transaction.atomic():
+            chapters = _number_chapters(book, PARSERS[format](source))
+            while True:
+                batch = [chapter for _, chapter in zip(range(batch_size), chapters)]
+                if not batch:
+                    break
+                Chapter.objects.bulk_create(batch)
+                search.index_objects('chapter', batch)
+                ChapterContent.store(batch)
+                count += len(batch)
+                first = batch[0].chapter_number if first is None else first
+                last = batch[-1].chapter_number
+            if not count:
+                raise InvalidImport('No chapters found.')
+            BookStats.refresh(book.pk)
+    except UnicodeDecodeError:
+        raise InvalidImport('The text is not UTF-8.')
+    homepage.mark_stale()
+    seconds = time.perf_counter() - start
+    return {
+        'chapters': count,
+        # Strings with two decimals, like chapter numbers everywhere else.
+        'first_chapter': f'{first:.2f}',
+        'last_chapter': f'{last:.2f}',
+        'seconds': round(seconds, 3),
+        'chapters_per_second': round(count / seconds, 1),
+    }
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from authentication.models import CustomUser
+from bookly.fastpath import book_rows, follow_rows, history_rows
+from bookly.models import Author, Book, BookStats, Chapter, ChapterContent, Follow, History
+from bookly.renderers import FastJSONRenderer
+from bookly.serializers import BookSerializer, FollowSerializer, HistorySerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Compare the ModelSerializer + JSONRenderer path of the list endpoints with the '
+            'values() + FastJSONRenderer path, and check that both render the same bytes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200, help='Rows per list (default: %(default)s).')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per path (default: %(default)s).')
+        parser.add_argument('--sample', type=int, default=0,
+                            help='Benchmark on this many generated books instead of the database '
+                                 'content, they are rolled back afterwards.')
+
+    def handle(self, *args, **options):
+        if not options['sample']:
+            self.run(options, user=History.objects.values_list('user', flat=True).first())
+            return
+        try:
+            with transaction.atomic():
+                self.run(options, user=self.create_sample(options['sample']))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_sample(self, number):
+        user = CustomUser.objects.create_user(username='bench-serializers', password=None)
+        author = Author.objects.create(name='Nguyễn Bench', bio='Tác giả thử nghiệm')
+        books = Book.objects.bulk_create([
+            Book(author=author, title=f'Sách thử số {index} "đặc biệt"', description='Mô tả\u2028\n' * (index % 3) or None,
+                 cover=f'covers/cover_{index}.png' if index % 2 else None)
+            for index in range(number)
+        ])
+        chapters = Chapter.objects.bulk_create([
+            Chapter(book=book, title=f'Chương {number}', chapter_number=Decimal(number) / 2, content='...')
+            for book in books for number in range(1, 4)
+        ])
+        ChapterContent.store(chapters)
+        now = timezone.now()
+        History.objects.bulk_create([
+            History(user=user, chapter=chapter, timestamp=now - timedelta(minutes=index, microseconds=index))
+            for index, chapter in enumerate(chapters)
+        ])
+        Follow.objects.bulk_create([Follow(user=user, book=book) for book in books])
+        BookStats.objects.bulk_create([BookStats(book_id=book_id, **values)
+                                       for book_id, values in BookStats.compute([book.pk for book in books]).items()])
+        return user.pk
+
+    def run(self, options, user):
+        rows, repeat = options['rows'], options['repeat']
+        books = Book.objects.order_by('id')
+        histories = History.objects.filter(user=user).order_by('-timestamp', 'id')
+        follows = Follow.objects.filter(user=user).order_by('id')
+
+        cases = [
+            ('books', lambda: BookSerializer(books.for_list()[:rows], many=True).data,
+             lambda: book_rows.serialize(books[:rows])),
+            ('history', lambda: HistorySerializer(histories[:rows], many=True).data,
+             lambda: history_rows.serialize(histories[:rows])),
+            ('follows', lambda: FollowSerializer(follows[:rows], many=True).data,
+             lambda: follow_rows.serialize(follows[:rows])),
+        ]
+        for name, serializer_data, fast_data in cases:
+            expected = JSONRenderer().render(serializer_data())
+            actual = FastJSONRenderer().render(fast_data())
+            if expected != actual:
+                raise CommandError(f'{name}: the fast path renders different bytes than the serializer.')
+
+            slow = self.measure(lambda: JSONRenderer().render(serializer_data()), repeat)
+            fast = self.measure(lambda: FastJSONRenderer().render(fast_data()), repeat)
+            self.stdout.write(f'{name:<8} {len(expected):>9} bytes  serializer {slow * 1000:8.2f} ms  '
+                              f'fast path {fast * 1000:8.2f} ms  x{slow / fast:.1f}')
+        self.stdout.write(self.style.SUCCESS('Both paths render identical bytes.'))
+
+    @staticmethod
+    def measure(function, repeat):
+        # Best of `repeat` runs, the least disturbed by the rest of the machine.
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+        return best
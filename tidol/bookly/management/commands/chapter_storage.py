@@ -0,0 +1,97 @@
+import hashlib
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+
+from bookly.models import Book, Chapter, ChapterContent
+
+
+class Command(BaseCommand):
+    help = ('Report the size of the chapter text store (text, stored and database bytes) and the '
+            'memory taken by chapter list queries, --verify it against the content hashes or '
+            '--repaginate it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=50,
+                            help='Books whose latest and first chapter are looked up (default: %(default)s).')
+        parser.add_argument('--verify', action='store_true',
+                            help='Decompress every chapter text and check it against its hash.')
+        parser.add_argument('--repaginate', action='store_true',
+                            help='Split every chapter text into pages again, after CHAPTER_PAGE_CHARS or '
+                                 'CHAPTER_READING_WPM changed.')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+            return
+        if options['repaginate']:
+            self.repaginate()
+            return
+
+        totals = ChapterContent.objects.aggregate(count=Count('pk'), size=Sum('size'), stored=Sum(Length('data')))
+        size, stored = totals['size'] or 0, totals['stored'] or 0
+        self.stdout.write(f"chapters          {Chapter.objects.count():>12}")
+        self.stdout.write(f"stored texts      {totals['count']:>12}")
+        for row in ChapterContent.objects.values('codec').annotate(count=Count('pk')).order_by('codec'):
+            self.stdout.write(f"  {row['codec']:<15} {row['count']:>12}")
+        self.stdout.write(f"text bytes        {size:>12}")
+        self.stdout.write(f"stored bytes      {stored:>12}  ({stored / size:.0%} of the text)" if size else
+                          f"stored bytes      {stored:>12}")
+        database = self.database_size()
+        if database is not None:
+            self.stdout.write(f"database bytes    {database:>12}")
+
+        books = list(Book.objects.order_by('pk')[:options['books']])
+        self.measure(f'latest and first chapter of {len(books)} book(s)',
+                     lambda: [(book.get_lastest_chapter(), book.get_first_chapter()) for book in books])
+        self.measure('every chapter row', lambda: list(Chapter.objects.all()))
+
+    def measure(self, name, function):
+        tracemalloc.start()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(f'{name}: {peak / 1e6:.1f} MB peak, {elapsed * 1000:.0f} ms')
+
+    @staticmethod
+    def database_size():
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()')
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_database_size(current_database())')
+            else:
+                return None
+            return cursor.fetchone()[0]
+
+    def verify(self):
+        bad = []
+        for body in ChapterContent.objects.order_by('pk').iterator(chunk_size=500):
+            if hashlib.sha256(body.text.encode()).hexdigest() != body.sha256:
+                bad.append(body.chapter_id)
+        missing = Chapter.objects.filter(body__isnull=True).count()
+        for chapter_id in bad:
+            self.stdout.write(f'Chapter {chapter_id}: text does not match its hash')
+        if bad or missing:
+            raise CommandError(f'{len(bad)} corrupt text(s), {missing} chapter(s) without text.')
+        self.stdout.write(self.style.SUCCESS('Every chapter text matches its hash.'))
+
+    def repaginate(self):
+        fields = ['page_offsets', 'word_count', 'reading_time']
+        batch, count = [], 0
+        for body in ChapterContent.objects.order_by('pk').iterator(chunk_size=500):
+            for field, value in ChapterContent.layout(body.text).items():
+                setattr(body, field, value)
+            batch.append(body)
+            if len(batch) >= 500:
+                ChapterContent.objects.bulk_update(batch, fields)
+                count += len(batch)
+                batch = []
+        ChapterContent.objects.bulk_update(batch, fields)
+        self.stdout.write(self.style.SUCCESS(f'Split {count + len(batch)} chapter text(s) into pages.'))
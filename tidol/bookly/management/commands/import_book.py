@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookly.importer import FORMATS, InvalidImport, guess_format, import_chapters
+from bookly.models import Book
+
+
+class Command(BaseCommand):
+    help = ('Add the chapters of a text, Markdown or EPUB file to a book, in one transaction, and report '
+            'the throughput in chapters per second.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('book', type=int, help='Id of the book.')
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument('--format', choices=sorted(set(FORMATS.values())),
+                            help='Format of the file, from its extension by default.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Chapters inserted per query (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        try:
+            book = Book.objects.get(pk=options['book'])
+        except Book.DoesNotExist:
+            raise CommandError(f"Book {options['book']} does not exist.")
+        file_format = options['format'] or guess_format(options['path'])
+        if file_format is None:
+            raise CommandError('Unknown file extension, pass --format.')
+
+        try:
+            with open(options['path'], 'rb') as source:
+                result = import_chapters(book, source, file_format, batch_size=options['batch_size'])
+        except OSError as error:
+            raise CommandError(error)
+        except InvalidImport as error:
+            raise CommandError(f'Nothing imported: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['chapters']} chapter(s), {result['first_chapter']} to {result['last_chapter']}, "
+            f"in {result['seconds']:.2f} s ({result['chapters_per_second']:.0f} chapters/s)."))
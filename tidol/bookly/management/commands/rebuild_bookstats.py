@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookly.models import BookStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the BookStats table from chapters and history, or check it for drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report books whose stats differ from the source tables.')
+
+    def handle(self, *args, **options):
+        computed = BookStats.compute()
+        stored = {stats.book_id: stats for stats in BookStats.objects.all()}
+
+        drifted = []
+        for book_id, values in computed.items():
+            stats = stored.get(book_id)
+            if stats is None:
+                drifted.append((book_id, 'missing'))
+                continue
+            for field, value in values.items():
+                if getattr(stats, field) != value:
+                    drifted.append((book_id, f'{field}: stored {getattr(stats, field)}, actual {value}'))
+
+        if options['check']:
+            for book_id, detail in drifted:
+                self.stdout.write(f'Book {book_id}: {detail}')
+            if drifted:
+                raise CommandError(f'{len(drifted)} drifted value(s) found.')
+            self.stdout.write(self.style.SUCCESS(f'Stats of {len(computed)} book(s) are up to date.'))
+            return
+
+        with transaction.atomic():
+            BookStats.objects.bulk_create(
+                [BookStats(book_id=book_id, **values) for book_id, values in computed.items()],
+                update_conflicts=True,
+                unique_fields=['book'],
+                update_fields=['view_count', 'chapter_count', 'latest_chapter_update', 'first_chapter_created'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats of {len(computed)} book(s), fixed {len(drifted)} drifted value(s).'))
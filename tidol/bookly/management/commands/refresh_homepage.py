@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from bookly.homepage import MAX_NUMBER, refresh_snapshot
+from bookly.models import HomePageSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored homepage snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('numbers', nargs='*', type=int,
+                            help='Values of the `number` parameter to rebuild (default: every stored snapshot).')
+        parser.add_argument('--stale-only', action='store_true', help='Only rebuild snapshots marked stale.')
+
+    def handle(self, *args, **options):
+        numbers = options['numbers']
+        if not numbers:
+            snapshots = HomePageSnapshot.objects.all()
+            if options['stale_only']:
+                snapshots = snapshots.filter(is_stale=True)
+            numbers = list(snapshots.values_list('number', flat=True))
+
+        for number in numbers:
+            refresh_snapshot(min(max(number, 1), MAX_NUMBER))
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {len(numbers)} homepage snapshot(s).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookly import trending
+
+
+class Command(BaseCommand):
+    help = 'Recompute the trending leaderboards from the view buckets and prune expired buckets.'
+
+    def handle(self, *args, **options):
+        count = trending.refresh_rankings()
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} trending entries.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookly import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of books, authors and (with SEARCH_INDEX_CHAPTERS) chapters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', help=f"Indexes to rebuild: {', '.join(search.INDEXES)} (default: all).")
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            raise CommandError('This database has no full-text search tables, search uses icontains.')
+        unknown = set(options['kinds']) - set(search.INDEXES)
+        if unknown:
+            raise CommandError(f"Unknown index(es): {', '.join(sorted(unknown))}.")
+        for kind in options['kinds'] or search.INDEXES:
+            with transaction.atomic():
+                count = search.reindex(kind)
+            if search.is_indexed(kind):
+                self.stdout.write(f'Indexed {count} {kind}(s).')
+            else:
+                self.stdout.write(f'Emptied the {kind} index, it is turned off.')
+        self.stdout.write(self.style.SUCCESS('Done.'))
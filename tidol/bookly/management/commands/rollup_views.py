@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bookly.rollups import fold_views, prune_guest_history
+
+
+class Command(BaseCommand):
+    help = 'Fold new History rows into ChapterViewDaily and prune old guest rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.HISTORY_GUEST_RETENTION_DAYS,
+                            help='Keep folded guest rows for this many days (default: %(default)s).')
+        parser.add_argument('--no-prune', action='store_true', help='Only fold, do not delete anything.')
+
+    def handle(self, *args, **options):
+        folded = fold_views()
+        self.stdout.write(f'Folded {folded} history row(s).')
+        if not options['no_prune']:
+            deleted = prune_guest_history(options['retention_days'])
+            self.stdout.write(f'Deleted {deleted} guest history row(s).')
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def populate_book_stats(apps, schema_editor):
+    Book = apps.get_model('bookly', 'Book')
+    Chapter = apps.get_model('bookly', 'Chapter')
+    History = apps.get_model('bookly', 'History')
+    BookStats = apps.get_model('bookly', 'BookStats')
+
+    stats = {book_id: BookStats(book_id=book_id) for book_id in Book.objects.values_list('id', flat=True)}
+    chapters = Chapter.objects.values('book_id').annotate(
+        chapter_count=Count('id'), latest_chapter_update=Max('lastupdated'), first_chapter_created=Min('created'))
+    for row in chapters:
+        row_stats = stats[row['book_id']]
+        row_stats.chapter_count = row['chapter_count']
+        row_stats.latest_chapter_update = row['latest_chapter_update']
+        row_stats.first_chapter_created = row['first_chapter_created']
+    for row in History.objects.values('chapter__book_id').annotate(view_count=Count('id')):
+        stats[row['chapter__book_id']].view_count = row['view_count']
+    BookStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0014_review_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookStats',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='bookly.book')),
+                ('view_count', models.BigIntegerField(default=0)),
+                ('chapter_count', models.PositiveIntegerField(default=0)),
+                ('latest_chapter_update', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('first_chapter_created', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-view_count'], name='bookstats_view_count_idx')],
+            },
+        ),
+        migrations.RunPython(populate_book_stats, migrations.RunPython.noop),
+    ]
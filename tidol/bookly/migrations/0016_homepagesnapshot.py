@@ -0,0 +1,22 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0015_bookstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HomePageSnapshot',
+            fields=[
+                ('number', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('data', models.JSONField()),
+                ('generated_at', models.DateTimeField()),
+                ('is_stale', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
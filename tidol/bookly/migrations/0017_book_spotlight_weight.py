@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0016_homepagesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='spotlight_weight',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
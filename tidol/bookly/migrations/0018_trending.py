@@ -0,0 +1,45 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0017_book_spotlight_weight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookly.book')),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='bookly.genre')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='bookly.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'start'], name='viewbucket_start_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bookviewbucket',
+            constraint=models.UniqueConstraint(fields=('book', 'granularity', 'start'), name='unique_view_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingentry',
+            index=models.Index(fields=['genre', 'rank'], name='trending_genre_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0018_trending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='history',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
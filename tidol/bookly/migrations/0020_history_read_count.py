@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0019_alter_history_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='history',
+            name='read_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
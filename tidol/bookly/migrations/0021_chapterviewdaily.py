@@ -0,0 +1,50 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0020_history_read_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('guest_views', models.PositiveIntegerField(default=0)),
+                ('unique_readers', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ViewRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rolled_up_to', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['chapter', 'timestamp'], name='history_chapter_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['timestamp'], name='history_timestamp_idx'),
+        ),
+        migrations.AddField(
+            model_name='chapterviewdaily',
+            name='chapter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='bookly.chapter'),
+        ),
+        migrations.AddConstraint(
+            model_name='chapterviewdaily',
+            constraint=models.UniqueConstraint(fields=('chapter', 'day'), name='unique_chapter_view_daily'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0021_chapterviewdaily'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookReaderSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(blank=True, null=True)),
+                ('sketch', models.BinaryField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reader_sketches', to='bookly.book')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChapterReaderSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sketch', models.BinaryField()),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reader_sketches', to='bookly.chapter')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookreadersketch',
+            constraint=models.UniqueConstraint(fields=('book', 'day'), name='unique_book_reader_sketch'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookreadersketch',
+            constraint=models.UniqueConstraint(condition=models.Q(('day', None)), fields=('book',), name='unique_book_reader_sketch_total'),
+        ),
+        migrations.AddConstraint(
+            model_name='chapterreadersketch',
+            constraint=models.UniqueConstraint(fields=('chapter', 'day'), name='unique_chapter_reader_sketch'),
+        ),
+    ]
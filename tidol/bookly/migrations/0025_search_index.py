@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+# (table, fields, tsvector weight of each field on PostgreSQL)
+INDEXES = [
+    ('bookly_book_fts', ('title', 'description'), ('A', 'B')),
+    ('bookly_author_fts', ('name',), ('A',)),
+    ('bookly_chapter_fts', ('title', 'content'), ('A', 'B')),
+]
+
+# Filled from these tables here; chapters only when SEARCH_INDEX_CHAPTERS is
+# on, through `manage.py reindex_search`.
+SOURCES = {
+    'bookly_book_fts': 'bookly_book',
+    'bookly_author_fts': 'bookly_author',
+}
+
+
+def create_search_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                # Search falls back to icontains, see bookly.search.get_backend().
+                return
+        for table, fields, _ in INDEXES:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(fields)}, "
+                f"tokenize = 'unicode61 remove_diacritics 2')")
+    elif connection.vendor == 'postgresql':
+        for table, fields, weights in INDEXES:
+            document = ' || '.join(f"setweight(to_tsvector('simple', coalesce({field}, '')), '{weight}')"
+                                   for field, weight in zip(fields, weights))
+            schema_editor.execute(
+                f"CREATE TABLE {table} (rowid bigint PRIMARY KEY, {', '.join(f'{field} text' for field in fields)}, "
+                f"document tsvector GENERATED ALWAYS AS ({document}) STORED)")
+            schema_editor.execute(f'CREATE INDEX {table}_document_idx ON {table} USING gin (document)')
+    else:
+        return
+
+    for table, fields, _ in INDEXES:
+        if table in SOURCES:
+            schema_editor.execute(
+                f"INSERT INTO {table} (rowid, {', '.join(fields)}) SELECT id, {', '.join(fields)} FROM {SOURCES[table]}")
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for table, _, _ in INDEXES:
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0024_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
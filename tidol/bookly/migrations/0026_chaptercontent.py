@@ -0,0 +1,68 @@
+import hashlib
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+COMPRESSION_LEVEL = 6
+
+
+def move_content(apps, schema_editor):
+    Chapter = apps.get_model('bookly', 'Chapter')
+    ChapterContent = apps.get_model('bookly', 'ChapterContent')
+
+    bodies = []
+    for chapter_id, text in Chapter.objects.order_by('pk').values_list('id', 'content').iterator(chunk_size=500):
+        raw = text.encode()
+        data, codec = zlib.compress(raw, COMPRESSION_LEVEL), 'zlib'
+        if len(data) >= len(raw):
+            data, codec = raw, 'raw'
+        bodies.append(ChapterContent(chapter_id=chapter_id, codec=codec, data=data,
+                                     sha256=hashlib.sha256(raw).hexdigest(), size=len(raw)))
+        if len(bodies) >= 500:
+            ChapterContent.objects.bulk_create(bodies)
+            bodies = []
+    ChapterContent.objects.bulk_create(bodies)
+
+
+def restore_content(apps, schema_editor):
+    Chapter = apps.get_model('bookly', 'Chapter')
+    ChapterContent = apps.get_model('bookly', 'ChapterContent')
+
+    for body in ChapterContent.objects.order_by('pk').iterator(chunk_size=500):
+        data = bytes(body.data)
+        if body.codec == 'zlib':
+            data = zlib.decompress(data)
+        Chapter.objects.filter(pk=body.chapter_id).update(content=data.decode())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0025_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterContent',
+            fields=[
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='bookly.chapter')),
+                ('codec', models.CharField(choices=[('raw', 'Uncompressed'), ('zlib', 'zlib')], default='zlib', max_length=8)),
+                ('data', models.BinaryField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(move_content, restore_content),
+        # A default lets the column be added back, empty, when unapplying.
+        migrations.AlterField(
+            model_name='chapter',
+            name='content',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='chapter',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,67 @@
+import zlib
+
+from django.db import migrations, models
+
+
+# The defaults of CHAPTER_PAGE_CHARS and CHAPTER_READING_WPM when this
+# migration was written. Run `manage.py chapter_storage --repaginate` to
+# apply other values.
+PAGE_CHARS = 3000
+READING_WPM = 200
+
+
+def paginate(text, page_chars):
+    # bookly.text.paginate() as of this migration.
+    offsets = [0]
+    start = 0
+    while len(text) - start > page_chars:
+        end = start + page_chars
+        cut = text.rfind('\n', start + 1, end + 1)
+        if cut < 0:
+            cut = text.rfind(' ', start + 1, end + 1)
+        start = cut + 1 if cut >= 0 else end
+        offsets.append(start)
+    return offsets
+
+
+def lay_out_pages(apps, schema_editor):
+    ChapterContent = apps.get_model('bookly', 'ChapterContent')
+
+    batch = []
+    for body in ChapterContent.objects.order_by('pk').iterator(chunk_size=500):
+        data = bytes(body.data)
+        text = (zlib.decompress(data) if body.codec == 'zlib' else data).decode()
+        body.page_offsets = paginate(text, PAGE_CHARS)
+        body.word_count = len(text.split())
+        body.reading_time = round(body.word_count * 60 / READING_WPM)
+        batch.append(body)
+        if len(batch) >= 500:
+            ChapterContent.objects.bulk_update(batch, ['page_offsets', 'word_count', 'reading_time'])
+            batch = []
+    ChapterContent.objects.bulk_update(batch, ['page_offsets', 'word_count', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0026_chaptercontent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chaptercontent',
+            name='page_offsets',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='chaptercontent',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chaptercontent',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(lay_out_pages, migrations.RunPython.noop),
+    ]
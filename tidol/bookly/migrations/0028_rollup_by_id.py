@@ -0,0 +1,71 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import TruncDate
+
+
+def fold_by_id(apps, schema_editor):
+    """
+    Switch the rollup watermark from a timestamp to a History id. Until now
+    signed-in rows and guest rows newer than `rolled_up_to` were counted live
+    and only `guest_views` of the daily rows was read. Every row is folded
+    now, so the daily rows keep their guest views and get everything that
+    was counted live added to them, which leaves each view count unchanged.
+    """
+    History = apps.get_model('bookly', 'History')
+    ChapterViewDaily = apps.get_model('bookly', 'ChapterViewDaily')
+    ViewRollupState = apps.get_model('bookly', 'ViewRollupState')
+
+    rolled_up_to = ViewRollupState.objects.filter(pk=1).values_list('rolled_up_to', flat=True).first()
+    last = History.objects.aggregate(last=Max('id'))['last'] or 0
+    ChapterViewDaily.objects.update(views=F('guest_views'), unique_readers=0)
+
+    history = History.objects.filter(id__lte=last)
+    if rolled_up_to is not None:
+        # Already in guest_views.
+        history = history.exclude(user=None, timestamp__lt=rolled_up_to)
+    rows = history.annotate(day=TruncDate('timestamp')).values('chapter_id', 'day').annotate(
+        views=Count('id'),
+        guest_views=Count('id', filter=Q(user=None)),
+        unique_readers=Count('user'),
+    )
+    deltas = {(row['chapter_id'], row['day']): row for row in rows}
+
+    changed = []
+    for rollup in ChapterViewDaily.objects.order_by('pk').iterator(chunk_size=500):
+        delta = deltas.pop((rollup.chapter_id, rollup.day), None)
+        if delta is None:
+            continue
+        rollup.views += delta['views']
+        rollup.guest_views += delta['guest_views']
+        rollup.unique_readers += delta['unique_readers']
+        changed.append(rollup)
+    ChapterViewDaily.objects.bulk_update(changed, ['views', 'guest_views', 'unique_readers'], batch_size=500)
+    ChapterViewDaily.objects.bulk_create([ChapterViewDaily(**row) for row in deltas.values()], batch_size=500)
+
+    ViewRollupState.objects.update_or_create(pk=1, defaults={'rolled_up_id': last, 'seen_id': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookly', '0027_chaptercontent_pages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='viewrollupstate',
+            name='rolled_up_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='viewrollupstate',
+            name='seen_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        # Not reversible: guest rows pruned since cannot be told apart any more.
+        migrations.RunPython(fold_by_id),
+        migrations.RemoveField(
+            model_name='viewrollupstate',
+            name='rolled_up_to',
+        ),
+    ]
@@ -1,8 +1,18 @@
+import hashlib
 import os
-from django.db import models
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.db.models.signals import post_save, pre_save
 from django.utils import timezone
 from authentication.models import CustomUser
 
+from .text import count_words, paginate
+
 
 class Author(models.Model):
     name = models.CharField(max_length=128)
@@ -19,18 +29,35 @@ def get_cover_upload_to(instance, filename):
     return os.path.join('covers/', new_filename)
 
 
+class BookQuerySet(models.QuerySet):
+    def for_list(self):
+        """
+        Books with everything BookSerializer reads (author and the BookStats
+        counters) fetched in the same SQL statement.
+        """
+        return self.select_related('author').annotate(
+            view_count=Coalesce('stats__view_count', 0),
+            chapter_count=Coalesce('stats__chapter_count', 0),
+            latest_chapter_update=F('stats__latest_chapter_update'),
+        )
+
+
 class Book(models.Model):
     title = models.CharField(max_length=128)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
     description = models.TextField(null=True)
     cover = models.ImageField(upload_to=get_cover_upload_to, null=True)
     lastupdated = models.DateTimeField(auto_now=True)
+    # Relative chance of being picked for the homepage spotlight, 0 never shows the book.
+    spotlight_weight = models.PositiveSmallIntegerField(default=1)
+
+    objects = BookQuerySet.as_manager()
 
     # Chapters
     # Many to many with Genres
     
     def count_views(self):
-        return sum([chapter.count_views() for chapter in Chapter.objects.filter(book=self)])
+        return count_chapter_views(Chapter.objects.filter(book=self))
     
     def get_lastest_chapter(self):
         return Chapter.objects.filter(book=self).order_by('-lastupdated').first()
@@ -38,15 +65,31 @@ class Book(models.Model):
     def get_first_chapter(self):
         return Chapter.objects.filter(book=self).order_by('created').first()
 
+    def get_stats(self):
+        try:
+            return self.stats
+        except BookStats.DoesNotExist:
+            return BookStats.rebuild(self.pk)
+
     def __str__(self):
         return self.title + " by " + str(self.author.name)
 
 
+class ChapterQuerySet(models.QuerySet):
+    def with_content(self, text=True):
+        """
+        Chapters with their ChapterContent fetched in the same SQL statement,
+        without the text itself when `text` is false.
+        """
+        queryset = self.select_related('body')
+        return queryset if text else queryset.defer('body__data')
+
+
 class Chapter(models.Model):
     title = models.CharField(max_length=128)
     chapter_number = models.DecimalField(max_digits=16, decimal_places=2, null=False, blank=False)
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='chapters')
-    content = models.TextField()
+    # The text is in ChapterContent, read and written through `content`.
     created = models.DateTimeField(auto_now_add=True)
     lastupdated = models.DateTimeField(auto_now=True)
     
@@ -54,21 +97,137 @@ class Chapter(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['book', 'chapter_number'], name='unique_chapter_number')
         ]  
-            
+
+    objects = ChapterQuerySet.as_manager()
+
+    # Text assigned to `content` and not saved yet.
+    _content = None
+
+    @property
+    def content(self):
+        """
+        The text of the chapter, read from ChapterContent on first use
+        (one query, unless fetched with with_content()).
+        """
+        if self._content is not None:
+            return self._content
+        if self.pk is None:
+            return ''
+        try:
+            return self.body.text
+        except ChapterContent.DoesNotExist:
+            return ''
+
+    @content.setter
+    def content(self, text):
+        self._content = text
+
     def count_views(self):
-        return History.objects.filter(chapter=self).count()
+        return count_chapter_views(Chapter.objects.filter(pk=self.pk))
 
     def save(self, *args, **kwargs):
         if self.pk is not None:
-            origin = Chapter.objects.get(pk=self.pk)
-            if origin.book != self.book:
+            origin_book_id = Chapter.objects.filter(pk=self.pk).values_list('book_id', flat=True).first()
+            if origin_book_id is not None and origin_book_id != self.book_id:
                 raise ValueError("Cannot change the book of a chapter.")
-        super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if self._content is not None:
+                ChapterContent.store([self])
 
     def __str__(self):
         return self.title + " - " + str(self.book.title)
 
 
+class ChapterContent(models.Model):
+    """
+    The text of a chapter, on its own row so that chapter lists and lookups
+    never read it. Stored zlib-compressed, or as is when that is not smaller,
+    with the SHA-256 and the UTF-8 size of the text. Split into pages of
+    about CHAPTER_PAGE_CHARS characters when it is written, `page_offsets`
+    holds the character offset each page starts at.
+    """
+    RAW = 'raw'
+    ZLIB = 'zlib'
+    CODEC_CHOICES = [(RAW, 'Uncompressed'), (ZLIB, 'zlib')]
+    COMPRESSION_LEVEL = 6
+
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, primary_key=True, related_name='body')
+    codec = models.CharField(max_length=8, choices=CODEC_CHOICES, default=ZLIB)
+    data = models.BinaryField()
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveIntegerField(default=0)
+    page_offsets = models.JSONField(default=list)
+    word_count = models.PositiveIntegerField(default=0)
+    # Estimated, in seconds.
+    reading_time = models.PositiveIntegerField(default=0)
+
+    @staticmethod
+    def layout(text):
+        """
+        The fields derived from the wording of `text`, as a dict.
+        """
+        words = count_words(text)
+        return {
+            'page_offsets': paginate(text, settings.CHAPTER_PAGE_CHARS),
+            'word_count': words,
+            'reading_time': round(words * 60 / settings.CHAPTER_READING_WPM),
+        }
+
+    @classmethod
+    def encode(cls, text):
+        """
+        The field values storing `text`, as a dict.
+        """
+        raw = text.encode()
+        data = zlib.compress(raw, cls.COMPRESSION_LEVEL)
+        codec = cls.ZLIB
+        if len(data) >= len(raw):
+            data, codec = raw, cls.RAW
+        return {'codec': codec, 'data': data, 'sha256': hashlib.sha256(raw).hexdigest(), 'size': len(raw),
+                **cls.layout(text)}
+
+    @property
+    def page_count(self):
+        return len(self.page_offsets) or 1
+
+    def page_range(self, page, length):
+        """
+        (start, end) character offsets of page `page`, counted from 0, of a
+        text `length` characters long. Raises IndexError past the last page.
+        """
+        offsets = self.page_offsets or [0]
+        if not 0 <= page < len(offsets):
+            raise IndexError(page)
+        return offsets[page], offsets[page + 1] if page + 1 < len(offsets) else length
+
+    @property
+    def text(self):
+        data = bytes(self.data)
+        if self.codec == self.ZLIB:
+            data = zlib.decompress(data)
+        return data.decode()
+
+    @classmethod
+    def store(cls, chapters):
+        """
+        Write the text assigned to the `content` of saved `chapters`, for
+        callers that bypass Chapter.save() such as bulk_create().
+        """
+        bodies = [cls(chapter=chapter, **cls.encode(chapter._content))
+                  for chapter in chapters if chapter._content is not None]
+        cls.objects.bulk_create(bodies, update_conflicts=True, unique_fields=['chapter'],
+                                update_fields=['codec', 'data', 'sha256', 'size', 'page_offsets', 'word_count',
+                                               'reading_time'],
+                                batch_size=500)
+        for body in bodies:
+            body.chapter.body = body
+            body.chapter._content = None
+
+    def __str__(self):
+        return f"{self.chapter_id} - {self.size} bytes ({self.codec})"
+
+
 class Genre(models.Model):
     name = models.CharField(max_length=128)
     books = models.ManyToManyField(Book, related_name='genres')
@@ -76,33 +235,209 @@ class Genre(models.Model):
     def __str__(self):
         return self.name
 
+class HistoryManager(models.Manager):
+    def bulk_record(self, reads, batch_size=250):
+        """
+        Upsert (user_id, chapter_id, timestamp) reads with one
+        INSERT ... ON CONFLICT (user, chapter) DO UPDATE per batch. An existing
+        row keeps the newest timestamp and has its read_count incremented.
+        Guest reads (user_id None) never conflict and always insert.
+
+        Returns (id, user_id, chapter_id, created) for every row written.
+        Works on SQLite >= 3.35 and PostgreSQL. Like bulk_create() it sends no
+        model signals, callers send views_recorded themselves.
+        """
+        latest = {}
+        guests = []
+        for user_id, chapter_id, timestamp in reads:
+            if user_id is None:
+                guests.append((None, chapter_id, timestamp))
+            elif (user_id, chapter_id) not in latest or latest[user_id, chapter_id] < timestamp:
+                latest[user_id, chapter_id] = timestamp
+        rows = guests + [(user_id, chapter_id, timestamp) for (user_id, chapter_id), timestamp in latest.items()]
+
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        timestamp_field = self.model._meta.get_field('timestamp')
+        columns = {name: qn(self.model._meta.get_field(name).column)
+                   for name in ('id', 'user', 'chapter', 'timestamp', 'read_count')}
+
+        written = []
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                params = []
+                for user_id, chapter_id, timestamp in batch:
+                    params += [user_id, chapter_id, timestamp_field.get_db_prep_value(timestamp, connection)]
+                cursor.execute(
+                    f"INSERT INTO {table} ({columns['user']}, {columns['chapter']}, {columns['timestamp']}, "
+                    f"{columns['read_count']}) VALUES {', '.join(['(%s, %s, %s, 1)'] * len(batch))} "
+                    f"ON CONFLICT ({columns['user']}, {columns['chapter']}) DO UPDATE SET "
+                    f"{columns['timestamp']} = CASE WHEN excluded.{columns['timestamp']} > {table}.{columns['timestamp']} "
+                    f"THEN excluded.{columns['timestamp']} ELSE {table}.{columns['timestamp']} END, "
+                    f"{columns['read_count']} = {table}.{columns['read_count']} + 1 "
+                    f"RETURNING {columns['id']}, {columns['user']}, {columns['chapter']}, {columns['read_count']}",
+                    params,
+                )
+                written += [(pk, user_id, chapter_id, read_count == 1)
+                            for pk, user_id, chapter_id, read_count in cursor.fetchall()]
+        return written
+
+    def record(self, user, chapter, timestamp=None):
+        """
+        Upsert a single read, returns (history id, created).
+        """
+        user_id = user.pk if user is not None else None
+        chapter_id = chapter.pk if isinstance(chapter, Chapter) else chapter
+        [(pk, _, _, created)] = self.bulk_record([(user_id, chapter_id, timestamp or timezone.now())])
+        return pk, created
+
+
 class History(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True)
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, null=False, blank=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, buffered and bulk writers pass the time of the read.
+    timestamp = models.DateTimeField(default=timezone.now)
+    read_count = models.PositiveIntegerField(default=1)
+
+    objects = HistoryManager()
     
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'chapter'], name='unique_history')
         ]
+        indexes = [
+            models.Index(fields=['chapter', 'timestamp'], name='history_chapter_time_idx'),
+            models.Index(fields=['timestamp'], name='history_timestamp_idx'),
+            models.Index(fields=['user', 'timestamp'], name='history_user_time_idx'),
+        ]
         
     def save(self, *args, **kwargs):
-        if self.user is None:
+        if self.user is None or self.pk:
             super().save(*args, **kwargs)
             return
-        if not self.pk:
-            try:
-                existing = History.objects.get(user=self.user, chapter=self.chapter)
-                self.pk = existing.pk
-            except History.DoesNotExist:
-                pass
+        # Upsert instead of looking the row up first, then send the signals save() would.
         self.timestamp = timezone.now()
-        super().save(*args, **kwargs)
+        pre_save.send(sender=History, instance=self, raw=False, using=History.objects.db, update_fields=None)
+        self.pk, created = History.objects.record(self.user, self.chapter_id, self.timestamp)
+        self._state.adding = False
+        self._state.db = History.objects.db
+        post_save.send(sender=History, instance=self, created=created, raw=False, using=History.objects.db,
+                       update_fields=None)
     
     def __str__(self):
         return f"{self.user.username if self.user else 'Guest'} - {self.chapter.title} - {timezone.localtime(self.timestamp)}"
 
 
+class ChapterViewDaily(models.Model):
+    """
+    Reads of a chapter on one day, folded from History by `manage.py rollup_views`.
+    Every folded read is in `views`, guest ones also in `guest_views` and
+    signed-in ones in `unique_readers` (a reader has one History row per
+    chapter). Guest rows are deleted some time after being folded, so these
+    counts are the only record of them.
+    """
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    guest_views = models.PositiveIntegerField(default=0)
+    unique_readers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chapter', 'day'], name='unique_chapter_view_daily')
+        ]
+
+    def __str__(self):
+        return f"{self.chapter_id} - {self.day} - {self.views}"
+
+
+class ViewRollupState(models.Model):
+    """
+    Single row holding how far History has been folded into ChapterViewDaily:
+    every row up to id `rolled_up_id`. `seen_id` is the highest id when the
+    last rollup ran, the next one folds up to there.
+    """
+    rolled_up_id = models.BigIntegerField(default=0)
+    seen_id = models.BigIntegerField(default=0)
+
+    @classmethod
+    def get(cls):
+        state, _ = cls.objects.get_or_create(pk=1)
+        return state
+
+    def __str__(self):
+        return f"Rolled up to History #{self.rolled_up_id}"
+
+
+class ChapterReaderSketch(models.Model):
+    """
+    HyperLogLog sketch (bookly.hll) of the distinct readers of a chapter on one day.
+    """
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='reader_sketches')
+    day = models.DateField()
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chapter', 'day'], name='unique_chapter_reader_sketch')
+        ]
+
+    def __str__(self):
+        return f"{self.chapter_id} - {self.day}"
+
+
+class BookReaderSketch(models.Model):
+    """
+    HyperLogLog sketch of the distinct readers of a book on one day, or over
+    all time when `day` is empty.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reader_sketches')
+    day = models.DateField(null=True, blank=True)
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'day'], name='unique_book_reader_sketch'),
+            models.UniqueConstraint(fields=['book'], condition=models.Q(day=None),
+                                    name='unique_book_reader_sketch_total'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} - {self.day or 'all time'}"
+
+
+def unrolled_history():
+    """
+    History rows not yet counted in ChapterViewDaily, those inserted since
+    the last rollup or two.
+    """
+    rolled_up_id = ViewRollupState.objects.filter(pk=1).values_list('rolled_up_id', flat=True).first()
+    return History.objects.filter(id__gt=rolled_up_id or 0)
+
+
+def count_chapter_views(chapters):
+    """
+    Total views of a Chapter queryset: folded views plus the un-rolled tail.
+    """
+    rolled_up = ChapterViewDaily.objects.filter(chapter__in=chapters).aggregate(views=Sum('views'))['views']
+    return (rolled_up or 0) + unrolled_history().filter(chapter__in=chapters).count()
+
+
+def count_views_by_chapter(chapters):
+    """
+    Like count_chapter_views() but grouped, returns {chapter_id: views}.
+    """
+    views = Counter()
+    rolled_up = ChapterViewDaily.objects.filter(chapter__in=chapters).values('chapter_id').annotate(
+        views=Sum('views'))
+    unrolled = unrolled_history().filter(chapter__in=chapters).values('chapter_id').annotate(views=Count('id'))
+    for row in [*rolled_up, *unrolled]:
+        views[row['chapter_id']] += row['views']
+    return views
+
+
 class Comment(models.Model):
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -110,6 +445,11 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chapter', 'created'], name='comment_chapter_time_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -124,6 +464,9 @@ class Review(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['book', 'user'], name='unique_review')
         ]
+        indexes = [
+            models.Index(fields=['book', 'timestamp'], name='review_book_time_idx'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.book.title} - {self.score}"
@@ -134,11 +477,15 @@ class Bookmark(models.Model):
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name="bookmarks", null=False,
                                    blank=False)
     page = models.IntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'chapter', 'page'], name="unique_bookmark")
         ]
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='bookmark_user_time_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user.username} - {self.chapter.book.title} - {self.chapter.chapter_number} - {self.page}"
@@ -156,5 +503,155 @@ class Follow(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'book'], name='unique_follow')
         ]
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='follow_user_time_idx'),
+        ]
     def __str__(self) -> str:
-        return f"{self.user.username} - {self.book.title} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.user.username} - {self.book.title} - {self.timestamp}"
+
+
+class BookStats(models.Model):
+    """
+    Denormalized per-book counters, kept up to date by the signal handlers in
+    bookly.signals so list views do not have to aggregate chapters and history.
+    Run `manage.py rebuild_bookstats --check` to detect drift.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    view_count = models.BigIntegerField(default=0)
+    chapter_count = models.PositiveIntegerField(default=0)
+    latest_chapter_update = models.DateTimeField(null=True, blank=True, db_index=True)
+    first_chapter_created = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-view_count'], name='bookstats_view_count_idx'),
+        ]
+
+    @staticmethod
+    def compute(book_ids=None):
+        """
+        Recompute stats from the source tables, returns {book_id: {field: value}}.
+        """
+        books = Book.objects.all() if book_ids is None else Book.objects.filter(pk__in=book_ids)
+        result = {
+            book_id: {'view_count': 0, 'chapter_count': 0, 'latest_chapter_update': None, 'first_chapter_created': None}
+            for book_id in books.values_list('id', flat=True)
+        }
+
+        chapters = Chapter.objects.filter(book__in=books).values('book_id').annotate(
+            chapter_count=Count('id'),
+            latest_chapter_update=Max('lastupdated'),
+            first_chapter_created=Min('created'),
+        )
+        for row in chapters:
+            result[row.pop('book_id')].update(row)
+
+        rolled_up = ChapterViewDaily.objects.filter(chapter__book__in=books).values('chapter__book_id').annotate(
+            view_count=Sum('views'))
+        for row in rolled_up:
+            result[row['chapter__book_id']]['view_count'] += row['view_count']
+        for row in unrolled_history().filter(chapter__book__in=books).values('chapter__book_id').annotate(
+                view_count=Count('id')):
+            result[row['chapter__book_id']]['view_count'] += row['view_count']
+        return result
+
+    @classmethod
+    def rebuild(cls, book_id):
+        values = cls.compute([book_id]).get(book_id)
+        if values is None:
+            return None
+        stats, _ = cls.objects.update_or_create(book_id=book_id, defaults=values)
+        return stats
+
+    @classmethod
+    def refresh(cls, book_id):
+        # Unlike rebuild() this never inserts, so it is safe while the book is being deleted.
+        values = cls.compute([book_id]).get(book_id)
+        if values is not None:
+            cls.objects.filter(book_id=book_id).update(**values)
+
+    @classmethod
+    def add_views(cls, book_id, count=1):
+        cls.objects.filter(book_id=book_id).update(view_count=F('view_count') + count)
+
+    @classmethod
+    def chapter_added(cls, chapter):
+        cls.objects.filter(book_id=chapter.book_id).update(
+            chapter_count=F('chapter_count') + 1,
+            latest_chapter_update=Coalesce(Greatest('latest_chapter_update', Value(chapter.lastupdated)),
+                                           Value(chapter.lastupdated)),
+            first_chapter_created=Coalesce(Least('first_chapter_created', Value(chapter.created)),
+                                           Value(chapter.created)),
+        )
+
+    @classmethod
+    def chapter_updated(cls, chapter):
+        cls.objects.filter(book_id=chapter.book_id).update(
+            latest_chapter_update=Coalesce(Greatest('latest_chapter_update', Value(chapter.lastupdated)),
+                                           Value(chapter.lastupdated)),
+        )
+
+    def __str__(self):
+        return f"{self.book_id} - {self.view_count} views - {self.chapter_count} chapters"
+
+
+class HomePageSnapshot(models.Model):
+    """
+    Rendered homepage sections for one value of the `number` query parameter,
+    built by bookly.homepage.refresh_snapshot().
+    """
+    number = models.PositiveSmallIntegerField(primary_key=True)
+    data = models.JSONField()
+    generated_at = models.DateTimeField()
+    is_stale = models.BooleanField(default=False)
+
+    def age(self):
+        return (timezone.now() - self.generated_at).total_seconds()
+
+    def __str__(self):
+        return f"Homepage ({self.number}) - {timezone.localtime(self.generated_at)}{' - stale' if self.is_stale else ''}"
+
+
+class BookViewBucket(models.Model):
+    """
+    Number of chapter reads of a book in one hour or one day, used to score
+    trending books (see bookly.trending).
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='view_buckets')
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    start = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'granularity', 'start'], name='unique_view_bucket')
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'start'], name='viewbucket_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} - {self.granularity} {timezone.localtime(self.start)} - {self.views}"
+
+
+class TrendingEntry(models.Model):
+    """
+    Precomputed trending leaderboards, one row per rank. Rows with no genre
+    form the overall list.
+    """
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='trending', null=True, blank=True)
+    rank = models.PositiveIntegerField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['genre', 'rank'], name='trending_genre_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.genre.name if self.genre else 'Overall'} #{self.rank} - {self.book_id} - {self.score:.2f}"
@@ -0,0 +1,217 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else
+              str(value) if isinstance(value, Decimal) else value
+              for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, fields):
+    """
+    The values of a cursor made by encode_cursor() from the model `fields`,
+    converted and validated by each field. Anything else, including a cursor
+    of another length, raises NotFound rather than reaching the database.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise NotFound('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise NotFound('Invalid cursor.')
+    decoded = []
+    for field, value in zip(fields, values):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise NotFound('Invalid cursor.')
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+        if value is None:
+            raise NotFound('Invalid cursor.')
+        decoded.append(value)
+    return decoded
+
+
+def lookup_field(model, lookup):
+    """
+    The model field at the end of `lookup`, such as 'stats__view_count'.
+    """
+    *relations, name = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def estimate_count(queryset, limit=None):
+    """
+    Number of rows of `queryset` without a full COUNT(*), as (count, exact).
+    PostgreSQL answers with the planner's estimate, other databases count
+    exactly but stop at `limit` rows (PAGINATION_COUNT_LIMIT by default).
+    """
+    limit = settings.PAGINATION_COUNT_LIMIT if limit is None else limit
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']['Plan Rows'], False
+    count = queryset[:limit + 1].count()
+    return min(count, limit), count <= limit
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination: the opaque cursor holds the ordering values of
+    the last row sent, and the next page is fetched with a WHERE on those
+    values instead of an OFFSET, so deep pages cost the same as the first one.
+
+    `ordering` must be unique over the queryset, end it with the primary key.
+    Requests without the cursor parameter get a plain list, as the endpoint
+    returned before it was paginated: the first `legacy_page_size` rows, or
+    every row when it is None. They are handed to `legacy_pagination_class`
+    instead when there is one. With `?count=estimate` the response also
+    carries estimate_count()'s result.
+    """
+    ordering = ('-id',)
+    page_size = 10
+    legacy_page_size = None
+    legacy_pagination_class = None
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def _position_filter(self, values):
+        # For an ordering (-a, -b), the rows after (x, y) are: a < x OR (a = x AND b < y)
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, values))):
+            name = field.lstrip('-')
+            after = Q(**{f'{name}__lt' if field.startswith('-') else f'{name}__gt': value})
+            condition = after if condition is None else after | (Q(**{name: value}) & condition)
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.legacy = self.cursor_query_param not in request.query_params
+        self.legacy_paginator = None
+        self.next_cursor = None
+        if self.legacy and self.legacy_pagination_class is not None:
+            self.legacy_paginator = self.legacy_pagination_class()
+            return self.legacy_paginator.paginate_queryset(queryset.order_by(*self.ordering), request, view)
+        if self.legacy:
+            return list(queryset.order_by(*self.ordering)[:self.legacy_page_size])
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.count = estimate_count(queryset)
+
+        queryset = queryset.annotate(**{
+            f'cursor_{index}': F(field.lstrip('-')) for index, field in enumerate(self.ordering)
+        }).order_by(*self.ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            fields = [lookup_field(queryset.model, field.lstrip('-')) for field in self.ordering]
+            queryset = queryset.filter(self._position_filter(decode_cursor(cursor, fields)))
+
+        # Fetch one extra row to know whether there is a next page.
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        if self.has_next:
+            last = page[-1]
+            self.next_cursor = encode_cursor([
+                last[key] if isinstance(last, dict) else getattr(last, key)
+                for key in (f'cursor_{index}' for index in range(len(self.ordering)))
+            ])
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_page_info(self):
+        """
+        The keys sent next to the results in cursor mode.
+        """
+        info = {'next': self.get_next_link()}
+        if self.count is not None:
+            info['count'], info['count_exact'] = self.count
+        return info
+
+    def get_paginated_response(self, data):
+        if self.legacy_paginator is not None:
+            return self.legacy_paginator.get_paginated_response(data)
+        if self.legacy:
+            return Response(data)
+        return Response({**self.get_page_info(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_exact': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class RecentUpdatesPagination(KeysetPagination):
+    ordering = ('-stats__latest_chapter_update', '-id')
+    page_size = 10
+    # The endpoint always returned the 10 most recently updated books.
+    legacy_page_size = 10
+
+
+class BookPagination(KeysetPagination):
+    ordering = ('id',)
+    page_size = 18
+    # Existing clients page through the catalogue with ?page=N.
+    legacy_pagination_class = PageNumberPagination
+
+
+class HistoryPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 20
+
+
+class FollowPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 20
+
+
+class BookmarkPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 20
+
+
+class CommentPagination(KeysetPagination):
+    ordering = ('created', 'id')
+    page_size = 20
+
+
+class ReviewPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 20
@@ -0,0 +1,79 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Bookmark, Chapter, History
+from .signals import ViewEvent, views_recorded
+
+
+def sync_progress(user, events, since=None):
+    """
+    Apply a batch of offline reading events ({'chapter', 'page', 'timestamp'})
+    for `user` and return what changed on the server since `since`.
+
+    History and bookmarks are upserted in one transaction, the newest
+    timestamp wins on both sides. Events for chapters that no longer exist
+    are skipped and reported back.
+    """
+    now = timezone.now()
+    # A client clock running ahead must not pin rows in the future.
+    events = [dict(event, timestamp=min(event['timestamp'], now)) for event in events]
+    book_ids = dict(Chapter.objects.filter(pk__in={event['chapter'] for event in events}).values_list('pk', 'book_id'))
+    rejected = sorted({event['chapter'] for event in events if event['chapter'] not in book_ids})
+    events = [event for event in events if event['chapter'] in book_ids]
+
+    sent_reads = {}
+    sent_bookmarks = {}
+    for event in events:
+        chapter_id, timestamp = event['chapter'], event['timestamp']
+        sent_reads[chapter_id] = max(timestamp, sent_reads.get(chapter_id, timestamp))
+        if event['page'] is not None:
+            key = (chapter_id, event['page'])
+            sent_bookmarks[key] = max(timestamp, sent_bookmarks.get(key, timestamp))
+
+    with transaction.atomic():
+        rows = History.objects.bulk_record((user.pk, chapter_id, timestamp) for chapter_id, timestamp in sent_reads.items())
+
+        existing = {
+            (bookmark.chapter_id, bookmark.page): bookmark
+            for bookmark in Bookmark.objects.filter(user=user, chapter_id__in={chapter_id for chapter_id, _ in sent_bookmarks})
+        }
+        changed, created = [], []
+        for (chapter_id, page), timestamp in sent_bookmarks.items():
+            bookmark = existing.get((chapter_id, page))
+            if bookmark is None:
+                created.append(Bookmark(user=user, chapter_id=chapter_id, page=page, timestamp=timestamp))
+            elif timestamp > bookmark.timestamp:
+                bookmark.timestamp = timestamp
+                changed.append(bookmark)
+        Bookmark.objects.bulk_update(changed, ['timestamp'], batch_size=500)
+        Bookmark.objects.bulk_create(created, batch_size=500)
+
+    views = [ViewEvent(event['chapter'], book_ids[event['chapter']], user.pk, None, event['timestamp'])
+             for event in events]
+    new_views = Counter(book_ids[chapter_id] for _, _, chapter_id, was_created in rows if was_created)
+    views_recorded.send(sender=History, views=views, new_views=dict(new_views))
+
+    # Everything newer than `since`, minus what the client just told us itself.
+    history = History.objects.filter(user=user).values('chapter_id', 'chapter__book_id', 'timestamp')
+    bookmarks = Bookmark.objects.filter(user=user).values('id', 'chapter_id', 'page', 'timestamp')
+    if since is not None:
+        history = history.filter(timestamp__gt=since)
+        bookmarks = bookmarks.filter(timestamp__gt=since)
+
+    return {
+        'server_time': now,
+        'history': [
+            {'chapter': row['chapter_id'], 'book': row['chapter__book_id'], 'timestamp': row['timestamp']}
+            for row in history.order_by('timestamp')
+            if row['chapter_id'] not in sent_reads or row['timestamp'] > sent_reads[row['chapter_id']]
+        ],
+        'bookmarks': [
+            {'id': row['id'], 'chapter': row['chapter_id'], 'page': row['page'], 'timestamp': row['timestamp']}
+            for row in bookmarks.order_by('timestamp')
+            if (row['chapter_id'], row['page']) not in sent_bookmarks
+            or row['timestamp'] > sent_bookmarks[row['chapter_id'], row['page']]
+        ],
+        'rejected': rejected,
+    }
@@ -0,0 +1,125 @@
+import uuid
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import BookReaderSketch, ChapterReaderSketch
+
+
+def _reader(view):
+    if view.reader is not None:
+        return view.reader
+    if view.user_id is not None:
+        return f'user:{view.user_id}'
+    # A guest read without any identity counts as a reader of its own.
+    return f'anonymous:{uuid.uuid4()}'
+
+
+def _merge_into(model, key_field, updates):
+    """
+    Merge {(object id, day): set of readers} into the stored sketches of `model`.
+    """
+    if not updates:
+        return
+    # Candidates by id and by day, matched against the keys here: one condition
+    # per key would hit SQLite's expression depth limit on large batches.
+    existing = {}
+    object_ids = sorted({object_id for object_id, _ in updates})
+    for start in range(0, len(object_ids), 500):
+        chunk = object_ids[start:start + 500]
+        chunk_ids = set(chunk)
+        days = {day for object_id, day in updates if object_id in chunk_ids}
+        condition = Q(day__in=days - {None})
+        if None in days:
+            condition |= Q(day__isnull=True)
+        for row in model.objects.select_for_update().filter(condition, **{f'{key_field}__in': chunk}):
+            key = (getattr(row, key_field), row.day)
+            if key in updates:
+                existing[key] = row
+
+    changed, created = [], []
+    for (object_id, day), readers in updates.items():
+        row = existing.get((object_id, day))
+        sketch = HyperLogLog.from_bytes(row.sketch) if row else HyperLogLog()
+        sketch.update(readers)
+        if row:
+            row.sketch = sketch.to_bytes()
+            changed.append(row)
+        else:
+            created.append(model(**{key_field: object_id, 'day': day, 'sketch': sketch.to_bytes()}))
+    model.objects.bulk_update(changed, ['sketch'], batch_size=500)
+    model.objects.bulk_create(created, batch_size=500)
+
+
+def record_readers(views):
+    """
+    Add the readers of a batch of ViewEvent to the daily chapter and book
+    sketches and to each book's all-time sketch.
+    """
+    chapter_updates = defaultdict(set)
+    book_updates = defaultdict(set)
+    for view in views:
+        reader = _reader(view)
+        day = timezone.localdate(view.timestamp)
+        chapter_updates[view.chapter_id, day].add(reader)
+        book_updates[view.book_id, day].add(reader)
+        book_updates[view.book_id, None].add(reader)
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _merge_into(ChapterReaderSketch, 'chapter_id', chapter_updates)
+                _merge_into(BookReaderSketch, 'book_id', book_updates)
+            return
+        except IntegrityError:
+            # Another process created one of the sketches first, merge into it instead.
+            if attempt:
+                raise
+
+
+def _count(sketches):
+    merged = HyperLogLog()
+    for sketch in sketches:
+        merged.merge(HyperLogLog.from_bytes(sketch))
+    return merged.count()
+
+
+def book_unique_readers(book_ids, since=None, until=None):
+    """
+    Approximate number of distinct readers of any of `book_ids`, over all time
+    or between the days `since` and `until` (inclusive). See hll.STANDARD_ERROR.
+    """
+    sketches = BookReaderSketch.objects.filter(book_id__in=book_ids)
+    if since is None and until is None:
+        sketches = sketches.filter(day=None)
+    else:
+        sketches = sketches.filter(day__isnull=False)
+        if since is not None:
+            sketches = sketches.filter(day__gte=since)
+        if until is not None:
+            sketches = sketches.filter(day__lte=until)
+    return _count(sketches.values_list('sketch', flat=True))
+
+
+def author_unique_readers(author_ids):
+    """
+    {author id: approximate number of distinct readers of any of their books,
+    over all time} in one query, for lists of authors.
+    """
+    sketches = defaultdict(list)
+    rows = BookReaderSketch.objects.filter(book__author_id__in=author_ids, day=None)
+    for author_id, sketch in rows.values_list('book__author_id', 'sketch'):
+        sketches[author_id].append(sketch)
+    return {author_id: _count(sketches[author_id]) for author_id in author_ids}
+
+
+def chapter_unique_readers(chapter_ids, since=None, until=None):
+    sketches = ChapterReaderSketch.objects.filter(chapter_id__in=chapter_ids)
+    if since is not None:
+        sketches = sketches.filter(day__gte=since)
+    if until is not None:
+        sketches = sketches.filter(day__lte=until)
+    return _count(sketches.values_list('sketch', flat=True))
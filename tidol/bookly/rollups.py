@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ChapterViewDaily, History, ViewRollupState
+
+
+def fold_views():
+    """
+    Fold the History rows inserted since the last run into ChapterViewDaily,
+    by id rather than by timestamp: buffered and synced reads carry the time
+    they happened, which can be older than rows folded already. The day of a
+    row is the day of its timestamp. Returns the number of History rows folded.
+
+    Rows up to the highest id seen by the previous run are folded, so that
+    inserts still uncommitted when that id was allocated (PostgreSQL can
+    commit them out of order) have had a whole run interval to land.
+    """
+    with transaction.atomic():
+        state = ViewRollupState.get()
+        state = ViewRollupState.objects.select_for_update().get(pk=state.pk)
+        fold_to = state.seen_id
+        state.seen_id = History.objects.aggregate(last=Max('id'))['last'] or fold_to
+        if fold_to <= state.rolled_up_id:
+            state.save()
+            return 0
+
+        rows = History.objects.filter(id__gt=state.rolled_up_id, id__lte=fold_to).annotate(
+            day=TruncDate('timestamp')).values('chapter_id', 'day').annotate(
+            views=Count('id'),
+            guest_views=Count('id', filter=Q(user=None)),
+            # One History row per signed-in reader and chapter, so these add up across runs.
+            unique_readers=Count('user'),
+        )
+        deltas = {(row['chapter_id'], row['day']): row for row in rows}
+        chapter_ids = sorted({chapter_id for chapter_id, _ in deltas})
+        changed = []
+        for start in range(0, len(chapter_ids), 500):
+            existing = ChapterViewDaily.objects.filter(chapter_id__in=chapter_ids[start:start + 500])
+            for rollup in existing.filter(day__in={day for _, day in deltas}):
+                delta = deltas.pop((rollup.chapter_id, rollup.day), None)
+                if delta is not None:
+                    rollup.views += delta['views']
+                    rollup.guest_views += delta['guest_views']
+                    rollup.unique_readers += delta['unique_readers']
+                    changed.append(rollup)
+        ChapterViewDaily.objects.bulk_update(changed, ['views', 'guest_views', 'unique_readers'], batch_size=500)
+        ChapterViewDaily.objects.bulk_create([ChapterViewDaily(**row) for row in deltas.values()], batch_size=500)
+
+        folded = History.objects.filter(id__gt=state.rolled_up_id, id__lte=fold_to).count()
+        state.rolled_up_id = fold_to
+        state.save()
+    return folded
+
+
+def prune_guest_history(retention_days, now=None):
+    """
+    Delete folded guest rows older than `retention_days`, returns how many.
+    Signed-in rows are kept, they back the reading history.
+    """
+    before = (now or timezone.now()) - timedelta(days=retention_days)
+    rolled_up_id = ViewRollupState.get().rolled_up_id
+    deleted, _ = History.objects.filter(user=None, id__lte=rolled_up_id, timestamp__lt=before).delete()
+    return deleted
@@ -0,0 +1,302 @@
+import html
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Author, Book, Chapter
+from .text import normalize
+
+
+# Indexed models: (model, search table, indexed fields, rank weight of each field).
+INDEXES = {
+    'book': (Book, 'bookly_book_fts', ('title', 'description'), (10.0, 1.0)),
+    'author': (Author, 'bookly_author_fts', ('name',), (1.0,)),
+    'chapter': (Chapter, 'bookly_chapter_fts', ('title', 'content'), (5.0, 1.0)),
+}
+
+# Fields searched with icontains when there is no index. Chapter text is
+# compressed (see ChapterContent), only chapter titles are searched then.
+FALLBACK_FIELDS = {
+    'chapter': ('title',),
+}
+
+MAX_TERMS = 10
+# Spellings of a term tried with đ in place of d, see SQLiteFTS.term().
+MAX_D_VARIANTS = 8
+WORD_RE = re.compile(r'\w+')
+
+# Private use characters around the matched terms, turned into <mark> tags
+# after the snippet has been HTML-escaped.
+MATCH_START, MATCH_END = '\ue000', '\ue001'
+
+
+class SQLiteFTS:
+    """
+    FTS5 virtual tables, the rowid is the primary key of the indexed row.
+    The unicode61 tokenizer drops diacritics except from đ, which has no
+    decomposition, so a d of the query also matches a đ.
+    """
+    folds_diacritics = True
+
+    @staticmethod
+    def term(term):
+        spellings = ['']
+        for char in term:
+            if char == 'd' and len(spellings) < MAX_D_VARIANTS:
+                spellings = [spelling + letter for spelling in spellings for letter in 'dđ']
+            else:
+                spellings = [spelling + char for spelling in spellings]
+        if len(spellings) == 1:
+            return f'"{term}"*'
+        return '(' + ' OR '.join(f'"{spelling}"*' for spelling in spellings) + ')'
+
+    @classmethod
+    def match(cls, terms):
+        # Every term, each as a prefix: "word"* AND ("dam"* OR "đam"*)
+        return ' AND '.join(cls.term(term) for term in terms)
+
+    def search(self, cursor, table, fields, weights, terms, limit):
+        cursor.execute(
+            f"SELECT rowid, snippet({table}, -1, %s, %s, '…', 16) FROM {table} "
+            f"WHERE {table} MATCH %s ORDER BY bm25({table}, {', '.join(map(str, weights))}), rowid LIMIT %s",
+            [MATCH_START, MATCH_END, self.match(terms), limit],
+        )
+        return cursor.fetchall()
+
+    def index(self, cursor, table, fields, rows):
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [row[:1] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES ({', '.join(['%s'] * (len(fields) + 1))})", rows)
+
+
+class PostgresFTS:
+    """
+    Plain tables with a generated, GIN-indexed tsvector column. The 'simple'
+    configuration is used: the catalogue is mostly Vietnamese, which has no
+    stemmer, nor does it drop diacritics.
+    """
+    folds_diacritics = False
+
+    @staticmethod
+    def match(terms):
+        return ' & '.join(f"'{term}':*" for term in terms)
+
+    def search(self, cursor, table, fields, weights, terms, limit):
+        text = f"concat_ws(' ', {', '.join(fields)})"
+        cursor.execute(
+            f"SELECT rowid, ts_headline('simple', {text}, query, %s) "
+            f"FROM {table}, to_tsquery('simple', %s) query "
+            f"WHERE document @@ query ORDER BY ts_rank(document, query) DESC, rowid LIMIT %s",
+            [f'StartSel={MATCH_START}, StopSel={MATCH_END}, MaxFragments=1, MaxWords=24, MinWords=8',
+             self.match(terms), limit],
+        )
+        return cursor.fetchall()
+
+    def index(self, cursor, table, fields, rows):
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES ({', '.join(['%s'] * (len(fields) + 1))}) "
+            f"ON CONFLICT (rowid) DO UPDATE SET {', '.join(f'{field} = EXCLUDED.{field}' for field in fields)}",
+            rows,
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTS,
+    'postgresql': PostgresFTS,
+}
+
+_available = {}
+
+
+def get_backend():
+    """
+    The full-text backend of the default database, or None when there is
+    none (another database, or SQLite built without FTS5) and search falls
+    back to icontains.
+    """
+    vendor = connection.vendor
+    if vendor not in _available:
+        tables = {table for _, table, _, _ in INDEXES.values()}
+        _available[vendor] = vendor in BACKENDS and tables <= set(connection.introspection.table_names())
+    return BACKENDS[vendor]() if _available[vendor] else None
+
+
+def is_indexed(kind):
+    return kind != 'chapter' or settings.SEARCH_INDEX_CHAPTERS
+
+
+def query_terms(query):
+    return [term.lower() for term in WORD_RE.findall(query or '')][:MAX_TERMS]
+
+
+def normalize_query(query, kind=None):
+    """
+    `query` reduced to what the search of `kind` distinguishes: Unicode
+    compatibility forms, case and whitespace always, diacritics when the
+    backend ignores them too (icontains does not). Queries with the same
+    normal form share their results.
+    """
+    backend = get_backend()
+    if backend is not None and backend.folds_diacritics and (kind is None or is_indexed(kind)):
+        return normalize(query or '')
+    return ' '.join(unicodedata.normalize('NFKC', query or '').casefold().split())
+
+
+class ResultCache:
+    """
+    LRU cache of search results, by (kind, normalized query, limit), for
+    SEARCH_CACHE_SECONDS. Saving or deleting an indexed row drops the entries
+    that listed it and, for a save, those whose terms now match its text, so
+    new and renamed books and authors show up at once in this process; other
+    processes see them when their entries expire.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, hits = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return hits
+
+    def set(self, key, hits):
+        if settings.SEARCH_CACHE_SIZE <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + settings.SEARCH_CACHE_SECONDS, hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.SEARCH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind, rows):
+        """
+        Drop the `kind` entries affected by `rows`, (pk, text...) tuples of
+        saved rows, or (pk,) for deleted ones.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == kind]
+        if not rows or not keys:
+            return
+        pks = {row[0] for row in rows}
+        # Substrings rather than word prefixes, it also covers icontains.
+        texts = [normalize(' '.join(text for text in row[1:] if text)) for row in rows if len(row) > 1]
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                terms = [normalize(term) for term in query_terms(key[1])]
+                if (any(pk in pks for pk, _ in entry[1])
+                        or any(all(term in text for term in terms) for text in texts)):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+result_cache = ResultCache()
+
+
+def _highlight(snippet):
+    return html.escape(snippet or '').replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+def search(kind, query, limit=None):
+    """
+    Ids of the `kind` rows matching every word of `query` (as prefixes), best
+    match first, as a list of (id, snippet). The snippet is HTML with the
+    matched words in <mark> tags.
+    """
+    limit = limit or settings.SEARCH_RESULT_LIMIT
+    query = normalize_query(query, kind)
+    terms = query_terms(query)
+    if not terms:
+        return []
+    key = (kind, query, limit)
+    hits = result_cache.get(key)
+    if hits is not None:
+        return hits
+
+    model, table, fields, weights = INDEXES[kind]
+    backend = get_backend()
+    if backend is None or not is_indexed(kind):
+        condition = reduce(or_, (Q(**{f'{field}__icontains': query}) for field in FALLBACK_FIELDS.get(kind, fields)))
+        hits = [(pk, None) for pk in model.objects.filter(condition).order_by('pk').values_list('pk', flat=True)[:limit]]
+    else:
+        with connection.cursor() as cursor:
+            hits = [(pk, _highlight(snippet)) for pk, snippet in backend.search(cursor, table, fields, weights, terms, limit)]
+    result_cache.set(key, hits)
+    return hits
+
+
+def index_objects(kind, objects):
+    """
+    Add or refresh the index entries of model instances of `kind`.
+    """
+    _, table, fields, _ = INDEXES[kind]
+    backend = get_backend()
+    indexed = backend is not None and is_indexed(kind)
+    # Only the fields searched: chapter text is not read (and decompressed)
+    # when chapters are not indexed.
+    if not indexed:
+        fields = FALLBACK_FIELDS.get(kind, fields)
+    rows = [(obj.pk, *(getattr(obj, field) for field in fields)) for obj in objects]
+    result_cache.invalidate(kind, rows)
+    if indexed and rows:
+        with connection.cursor() as cursor:
+            backend.index(cursor, table, fields, rows)
+
+
+def unindex(kind, pks):
+    result_cache.invalidate(kind, [(pk,) for pk in pks])
+    backend = get_backend()
+    if backend is None or not pks:
+        return
+    _, table, _, _ = INDEXES[kind]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in pks])
+
+
+def reindex(kind, batch_size=500):
+    """
+    Rebuild the index of `kind` from its table, returns the number of rows
+    indexed. An index that is turned off is emptied.
+    """
+    result_cache.clear()
+    backend = get_backend()
+    if backend is None:
+        return 0
+    model, table, fields, _ = INDEXES[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+    if not is_indexed(kind):
+        return 0
+    # Chapter text is read along with the chapter, see ChapterContent.
+    queryset = model.objects.with_content() if model is Chapter else model.objects.only('pk', *fields)
+    count = 0
+    batch = []
+    for obj in queryset.order_by('pk').iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            index_objects(kind, batch)
+            count += len(batch)
+            batch = []
+    index_objects(kind, batch)
+    return count + len(batch)
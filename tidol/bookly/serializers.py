@@ -1,15 +1,79 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import permissions, serializers
 
-from .models import Author, Book, Chapter, Comment, Review, Bookmark, Follow, History
+from .hll import STANDARD_ERROR
+from .models import Author, Book, Chapter, Comment, Review, Bookmark, Follow, History, count_views_by_chapter
+from .readers import book_unique_readers
+
+
+MAX_PROGRESS_EVENTS = 500
+
+UNIQUE_READERS_HELP = (f'Approximate number of distinct signed-in and guest readers, '
+                       f'standard error {STANDARD_ERROR:.2%}.')
+
+
+def _split_names(value):
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+def requested_fields(request, available):
+    """
+    The names of `available` selected by the `?fields=a,b` and `?omit=a,b`
+    query parameters, in `available` order, or None when neither is given.
+    """
+    params = request.query_params
+    if 'fields' not in params and 'omit' not in params:
+        return None
+    fields = _split_names(params['fields']) if 'fields' in params else list(available)
+    omit = _split_names(params.get('omit', ''))
+    unknown = sorted(set(fields + omit) - set(available))
+    if unknown:
+        raise serializers.ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}."})
+    return [name for name in available if name in fields and name not in omit]
+
+
+class SparseFieldsMixin:
+    """
+    Drops the fields not selected by `?fields=` / `?omit=` on read requests,
+    see requested_fields(). Views reading the serializer's data should also
+    leave out the columns and joins of the dropped fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return
+        fields = requested_fields(request, list(self.fields))
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class AuthorSerializer(serializers.ModelSerializer):
+    unique_readers = serializers.SerializerMethodField(help_text=UNIQUE_READERS_HELP)
+
+    def get_unique_readers(self, obj):
+        # Lists pass {author id: readers} from author_unique_readers() in the context.
+        if 'unique_readers' in self.context:
+            return self.context['unique_readers'][obj.pk]
+        return book_unique_readers(obj.books.values('id'))
+
     class Meta:
         model = Author
-        fields = ['id', 'name', 'bio']
+        fields = ['id', 'name', 'bio', 'unique_readers']
+
 
+class BookStatsMixin:
+    def _get_stat(self, obj, name):
+        # Annotated by Book.objects.for_list(), otherwise read from BookStats.
+        if hasattr(obj, name):
+            return getattr(obj, name)
+        return getattr(obj.get_stats(), name)
 
-class BookSerializer(serializers.ModelSerializer):
+
+class BookSerializer(SparseFieldsMixin, BookStatsMixin, serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.name', read_only=True)
     viewcount = serializers.SerializerMethodField()
     number_of_chapters = serializers.SerializerMethodField()
@@ -17,17 +81,16 @@ class BookSerializer(serializers.ModelSerializer):
     cover = serializers.SerializerMethodField()
     
     def get_viewcount(self, obj):
-        return obj.count_views()
+        return self._get_stat(obj, 'view_count')
     
     def get_number_of_chapters(self, obj):
-        return obj.chapters.count()
+        return self._get_stat(obj, 'chapter_count')
     
     def get_lastupdated(self, obj):
-        lastupdated = obj.lastupdated
-        chapters = obj.chapters.all()
-        if chapters:
-            lastupdated = max([lastupdated] + [chapter.lastupdated for chapter in chapters])
-        return lastupdated
+        latest_chapter_update = self._get_stat(obj, 'latest_chapter_update')
+        if latest_chapter_update:
+            return max(obj.lastupdated, latest_chapter_update)
+        return obj.lastupdated
     
     def get_cover(self, obj):
         cover_url = str(obj.cover)
@@ -38,10 +101,14 @@ class BookSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'author', 'author_name', 'description', 'cover', 'viewcount', 'number_of_chapters', 'lastupdated']
 
 
-class BookDetailSerializer(serializers.ModelSerializer):
+class BookDetailSerializer(BookStatsMixin, serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.name', read_only=True)
     is_followed = serializers.SerializerMethodField()
     cover = serializers.SerializerMethodField()
+    unique_readers = serializers.SerializerMethodField(help_text=UNIQUE_READERS_HELP)
+    
+    def get_unique_readers(self, obj):
+        return book_unique_readers([obj.pk])
     
     def get_is_followed(self, obj):
         request = self.context.get('request')
@@ -55,39 +122,87 @@ class BookDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Book
-        fields = ['id', 'title', 'author', 'author_name', 'description', 'cover', 'is_followed', 'chapters']
+        fields = ['id', 'title', 'author', 'author_name', 'description', 'cover', 'is_followed', 'unique_readers', 'chapters']
 
     class ChapterSerializer(serializers.ModelSerializer):
+        """
+        User-independent table of contents entry, see get_table_of_contents().
+        """
         viewcount = serializers.SerializerMethodField()
-        is_read = serializers.SerializerMethodField()
         
         class Meta:
             model = Chapter
-            fields = ['id', 'title', 'chapter_number', 'lastupdated', 'is_read', 'viewcount']
-        
-        def get_is_read(self, obj):
-            request = self.context.get('request')
-            if request and request.user.is_authenticated:
-                return History.objects.filter(user=request.user, chapter=obj).exists()
-            return False
+            fields = ['id', 'title', 'chapter_number', 'lastupdated', 'viewcount']
         
         def get_viewcount(self, obj):
-            return obj.count_views()
+            return self.context['viewcounts'][obj.id]
+
+    chapters = serializers.SerializerMethodField()
+
+    def get_table_of_contents(self, obj):
+        """
+        The chapter list without the per-user `is_read`, shared by all readers
+        through the cache for BOOK_TOC_CACHE_SECONDS. The key changes whenever
+        a chapter is added, edited or removed.
+        """
+        latest_chapter_update = self._get_stat(obj, 'latest_chapter_update')
+        cache_key = (f"book-toc:{obj.pk}:{self._get_stat(obj, 'chapter_count')}:"
+                     f"{latest_chapter_update.timestamp() if latest_chapter_update else ''}")
+        toc = cache.get(cache_key)
+        if toc is None:
+            chapters = Chapter.objects.filter(book=obj).only('id', 'title', 'chapter_number', 'lastupdated').order_by('pk')
+            viewcounts = count_views_by_chapter(Chapter.objects.filter(book=obj))
+            toc = self.ChapterSerializer(chapters, many=True, context={'viewcounts': viewcounts}).data
+            cache.set(cache_key, toc, settings.BOOK_TOC_CACHE_SECONDS)
+        return toc
 
-    chapters = ChapterSerializer(many=True, read_only=True)
+    def get_chapters(self, obj):
+        read = set()
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            read = set(History.objects.filter(user=request.user, chapter__book=obj).values_list('chapter_id', flat=True))
+        return [
+            {
+                'id': entry['id'],
+                'title': entry['title'],
+                'chapter_number': entry['chapter_number'],
+                'lastupdated': entry['lastupdated'],
+                'is_read': entry['id'] in read,
+                'viewcount': entry['viewcount'],
+            }
+            for entry in self.get_table_of_contents(obj)
+        ]
 
 
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Chapter.content is a property over ChapterContent.
+    content = serializers.CharField(style={'base_template': 'textarea.html'})
+    word_count = serializers.IntegerField(source='body.word_count', read_only=True)
+    reading_time = serializers.IntegerField(source='body.reading_time', read_only=True)
+    page_count = serializers.IntegerField(source='body.page_count', read_only=True)
     viewcount = serializers.SerializerMethodField()
     
     class Meta:
         model = Chapter
-        fields = ['id', 'title', 'chapter_number', 'book', 'content', 'created', 'lastupdated', 'viewcount']
+        fields = ['id', 'title', 'chapter_number', 'book', 'content', 'word_count', 'reading_time', 'page_count',
+                  'created', 'lastupdated', 'viewcount']
         read_only_fields = ['created', 'lastupdated']
         
     def get_viewcount(self, obj):
         return obj.count_views()
 
+
+class ReaderChapterSerializer(ChapterSerializer):
+    """
+    ChapterSerializer without the view count and its two aggregate queries,
+    for the reader session.
+    """
+    viewcount = None
+
+    class Meta(ChapterSerializer.Meta):
+        fields = [name for name in ChapterSerializer.Meta.fields if name != 'viewcount']
+
+
 class BookmarkSerializer(serializers.ModelSerializer):
     book_title = serializers.CharField(source='chapter.book.title', read_only=True)
     class Meta:
@@ -99,6 +214,8 @@ class BookmarkSerializer(serializers.ModelSerializer):
 class CommentSerializer(serializers.ModelSerializer):
     chapter_title = serializers.CharField(source='chapter.title', read_only=True)
     book_title = serializers.CharField(source='chapter.book.title', read_only=True)
+    content = serializers.CharField(source='text')
+    timestamp = serializers.DateTimeField(source='created', read_only=True)
     
     class Meta:
         model = Comment
@@ -140,7 +257,7 @@ class FollowSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'author_id', 'author_name', 'book_id', 'book_title', 'book_description', 'book_cover', 'latest_chapter', 'timestamp']
         read_only_fields = ['timestamp']
         
-class HistorySerializer(serializers.ModelSerializer):
+class HistorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_id = serializers.IntegerField(source='chapter.book.author.id', read_only=True)
     author_name = serializers.CharField(source='chapter.book.author.name', read_only=True)
     book_id = serializers.IntegerField(source='chapter.book.id', read_only=True)
@@ -155,5 +272,14 @@ class HistorySerializer(serializers.ModelSerializer):
         model = History
         fields = ['id', 'author_id', 'author_name', 'book_id', 'book_title', 'book_description', 'book_cover', 'chapter_id', 'chapter_title', 'chapter_number', 'timestamp']
         read_only_fields = ['timestamp']
-    
-    
\ No newline at end of file
+
+
+class ProgressEventSerializer(serializers.Serializer):
+    chapter = serializers.IntegerField()
+    page = serializers.IntegerField(min_value=0, required=False, allow_null=True, default=None)
+    timestamp = serializers.DateTimeField()
+
+
+class ProgressSyncSerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    events = ProgressEventSerializer(many=True, max_length=MAX_PROGRESS_EVENTS)
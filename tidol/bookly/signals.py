@@ -0,0 +1,168 @@
+from collections import Counter, defaultdict, namedtuple
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import homepage, readers, search, trending
+from .genres import genre_index
+from .models import Author, Book, BookStats, BookViewBucket, Chapter, Genre, History
+from .spotlight import sampler
+from .suggest import AUTHOR, BOOK, suggestions
+
+
+# One chapter read. `reader` identifies the user or guest session when known.
+ViewEvent = namedtuple('ViewEvent', ['chapter_id', 'book_id', 'user_id', 'reader', 'timestamp'])
+
+# Sent after chapter reads were written to History, with `views` (a list of
+# ViewEvent) and `new_views` ({book_id: number of History rows inserted}).
+# Bulk writers that bypass Model.save() must send it themselves.
+views_recorded = Signal()
+
+
+@receiver(post_save, sender=Book)
+def create_book_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        BookStats.objects.get_or_create(book=instance)
+
+
+@receiver(post_save, sender=Book)
+def update_spotlight_on_book_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sampler.add(instance.pk, instance.spotlight_weight)
+
+
+@receiver(post_delete, sender=Book)
+def update_spotlight_on_book_delete(sender, instance, **kwargs):
+    sampler.remove(instance.pk)
+
+
+@receiver(post_save, sender=Chapter)
+def update_stats_on_chapter_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        BookStats.chapter_added(instance)
+    else:
+        BookStats.chapter_updated(instance)
+
+
+@receiver(post_delete, sender=Chapter)
+def update_stats_on_chapter_delete(sender, instance, **kwargs):
+    # Deleting a chapter also cascades to its history, so recount everything.
+    BookStats.refresh(instance.book_id)
+
+
+@receiver(post_save, sender=History)
+def send_views_recorded(sender, instance, created, raw=False, **kwargs):
+    # A returning user only refreshes the timestamp of their existing row.
+    # History rows are only removed by chapter/book cascades, handled above.
+    if raw:
+        return
+    view = ViewEvent(instance.chapter_id, instance.chapter.book_id, instance.user_id, None, instance.timestamp)
+    views_recorded.send(sender=History, views=[view], new_views={view.book_id: 1} if created else {})
+
+
+@receiver(views_recorded)
+def update_stats_on_views(sender, new_views, **kwargs):
+    for book_id, count in new_views.items():
+        BookStats.add_views(book_id, count)
+
+
+@receiver(views_recorded)
+def record_unique_readers(sender, views, **kwargs):
+    readers.record_readers(views)
+
+
+@receiver(views_recorded)
+def record_trending_views(sender, views, **kwargs):
+    # Every read counts towards trending, including a user re-reading a chapter.
+    counts_by_hour = defaultdict(Counter)
+    for view in views:
+        counts_by_hour[trending.bucket_start(view.timestamp, BookViewBucket.HOUR)][view.book_id] += 1
+    for hour, counts in counts_by_hour.items():
+        trending.record_views(counts, hour)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def mark_homepage_stale(sender, raw=False, **kwargs):
+    if not raw:
+        homepage.mark_stale()
+
+
+@receiver(views_recorded)
+def mark_homepage_stale_on_views(sender, new_views, **kwargs):
+    if new_views:
+        homepage.mark_stale()
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Chapter)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_objects(sender._meta.model_name, [instance])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Chapter)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def update_suggestions_on_book_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggestions.update(BOOK, instance.pk, instance.title)
+
+
+@receiver(post_save, sender=Author)
+def update_suggestions_on_author_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggestions.update(AUTHOR, instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_suggestion(sender, instance, **kwargs):
+    suggestions.remove(BOOK, instance.pk)
+
+
+@receiver(post_delete, sender=Author)
+def remove_author_suggestion(sender, instance, **kwargs):
+    suggestions.remove(AUTHOR, instance.pk)
+
+
+@receiver(m2m_changed, sender=Genre.books.through)
+def update_genre_index(sender, instance, action, reverse, pk_set, **kwargs):
+    # genre.books.add(*books) has the genre as instance, book.genres.add(*genres) the book.
+    if action == 'post_clear':
+        if reverse:
+            genre_index.discard(None, [instance.pk])
+        else:
+            genre_index.clear(instance.pk)
+    elif action in ('post_add', 'post_remove') and pk_set:
+        genre_ids, book_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        if action == 'post_add':
+            genre_index.add(genre_ids, book_ids)
+        else:
+            genre_index.discard(genre_ids, book_ids)
+
+
+@receiver(post_save, sender=Genre)
+def update_genre_index_on_genre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        genre_index.set_genre(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Genre)
+def remove_genre_from_index(sender, instance, **kwargs):
+    genre_index.remove_genre(instance.pk)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_from_genre_index(sender, instance, **kwargs):
+    # The cascade deletes the Genre.books rows without sending m2m_changed.
+    genre_index.discard(None, [instance.pk])
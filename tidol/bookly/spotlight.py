@@ -0,0 +1,116 @@
+import bisect
+import itertools
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Book
+
+
+class SpotlightSampler:
+    """
+    Dense in-memory array of book ids (and their spotlight weights) so that the
+    homepage spotlight can be sampled without `ORDER BY RANDOM()` scanning the
+    whole book table. Kept current by the Book signal handlers and reloaded
+    periodically to pick up books written by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = []
+        self._weights = []
+        self._positions = {}
+        self._cum_weights = None
+        self._loaded_at = None
+
+    def load(self):
+        rows = list(Book.objects.filter(spotlight_weight__gt=0).values_list('id', 'spotlight_weight'))
+        with self._lock:
+            self._ids = [book_id for book_id, _ in rows]
+            self._weights = [weight for _, weight in rows]
+            self._positions = {book_id: position for position, book_id in enumerate(self._ids)}
+            self._cum_weights = None
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > settings.SPOTLIGHT_RELOAD_INTERVAL:
+            self.load()
+
+    def add(self, book_id, weight=1):
+        if weight <= 0:
+            self.remove(book_id)
+            return
+        with self._lock:
+            position = self._positions.get(book_id)
+            if position is None:
+                self._positions[book_id] = len(self._ids)
+                self._ids.append(book_id)
+                self._weights.append(weight)
+            else:
+                self._weights[position] = weight
+            self._cum_weights = None
+
+    def remove(self, book_id):
+        # Swap with the last element so the arrays stay dense.
+        with self._lock:
+            position = self._positions.pop(book_id, None)
+            if position is None:
+                return
+            last_id, last_weight = self._ids.pop(), self._weights.pop()
+            if position < len(self._ids):
+                self._ids[position] = last_id
+                self._weights[position] = last_weight
+                self._positions[last_id] = position
+            self._cum_weights = None
+
+    def sample(self, number):
+        """
+        Draw up to `number` distinct book ids, with probability proportional
+        to each book's spotlight weight.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            if number >= len(self._ids):
+                ids = list(self._ids)
+                random.shuffle(ids)
+                return ids
+            if self._cum_weights is None:
+                self._cum_weights = list(itertools.accumulate(self._weights))
+            # Drawn under the lock: remove() and add() change _ids in place.
+            ids, cum_weights = self._ids, self._cum_weights
+            total = cum_weights[-1]
+            picked = {}
+            for _ in range(number * 20):
+                book_id = ids[bisect.bisect_right(cum_weights, random.random() * total)]
+                picked[book_id] = None
+                if len(picked) == number:
+                    break
+        return list(picked)
+
+    def get_books(self, number, queryset=None):
+        """
+        Sample `number` books. Ids that no longer exist are dropped from the
+        array and replaced once. `queryset` may also be a values() queryset.
+        """
+        queryset = Book.objects.all() if queryset is None else queryset
+        books = []
+        seen = set()
+        for _ in range(2):
+            ids = [book_id for book_id in self.sample(number + len(seen)) if book_id not in seen][:number - len(books)]
+            if not ids:
+                break
+            found = {book['id'] if isinstance(book, dict) else book.pk: book for book in queryset.filter(pk__in=ids)}
+            for book_id in ids:
+                seen.add(book_id)
+                if book_id in found:
+                    books.append(found[book_id])
+                else:
+                    self.remove(book_id)
+            if len(books) >= number:
+                break
+        return books
+
+
+sampler = SpotlightSampler()
@@ -0,0 +1,43 @@
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .renderers import FastJSONRenderer
+
+
+STREAM_QUERY_PARAM = 'stream'
+
+
+def wants_stream(request):
+    return request.query_params.get(STREAM_QUERY_PARAM, '').lower() in ('1', 'true')
+
+
+def iter_json_array(queryset, mapper, chunk_size):
+    """
+    Render the rows of `queryset` through `mapper` as one JSON array, a chunk
+    at a time. Only `chunk_size` rows are held in memory at once, and the
+    bytes equal rendering the whole list in one go.
+    """
+    renderer = FastJSONRenderer()
+    rows = mapper.values(queryset).iterator(chunk_size=chunk_size)
+    yield b'['
+    separator = b''
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        # Render the chunk as a list and drop its brackets.
+        yield separator + renderer.render(mapper.map(chunk))[1:-1]
+        separator = b','
+    yield b']'
+
+
+def stream_rows(queryset, mapper, chunk_size=None):
+    """
+    StreamingHttpResponse sending the whole of `queryset` as a JSON array,
+    for endpoints that opt in to `?stream=1`. The status is committed before
+    the first row is read, an error half way through truncates the body.
+    """
+    chunk_size = chunk_size or settings.STREAMING_CHUNK_SIZE
+    return StreamingHttpResponse(iter_json_array(queryset, mapper, chunk_size), content_type='application/json')
@@ -0,0 +1,287 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Sum
+
+from .models import Author, Book
+from .text import normalize
+
+logger = logging.getLogger(__name__)
+
+BOOK, AUTHOR = 'book', 'author'
+
+# A title is also found from its 2nd, 3rd... word, up to this many words in.
+WORD_KEYS = 6
+# Only the start of a key is ever compared with what the user typed.
+KEY_LENGTH = 40
+# Changes since the last load are kept in a small sorted list that is
+# scanned on every query; past this size the index is rebuilt.
+MAX_DELTA_ENTRIES = 10000
+
+
+def _keys(label):
+    words = normalize(label).split()
+    return {' '.join(words[start:])[:KEY_LENGTH] for start in range(min(len(words), WORD_KEYS))}
+
+
+def _encode(kind, pk):
+    return pk * 2 + (kind == AUTHOR)
+
+
+def _decode(code):
+    return (AUTHOR if code & 1 else BOOK), code >> 1
+
+
+def _upper_bound(prefix):
+    # The smallest string greater than every string starting with `prefix`.
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class _Snapshot:
+    """
+    The index as loaded from the database, in flat arrays: sorted keys in
+    one string, labels in one UTF-8 blob, and a max segment tree over the
+    weight of each key so the heaviest matches of a key range come out in
+    O(log n) each. Entries are never moved, removing one sets its weight to -1.
+    """
+
+    def __init__(self, items, max_entries):
+        # `items` are (code, label, weight), the most popular kept within max_entries.
+        items = sorted(items, key=lambda item: item[2], reverse=True)
+        kept, entry_count = [], 0
+        for code, label, weight in items:
+            keys = _keys(label)
+            if entry_count + len(keys) > max_entries:
+                break
+            kept.append((code, label, weight, keys))
+            entry_count += len(keys)
+        kept.sort(key=lambda item: item[0])
+
+        self.codes = array('q', (code for code, _, _, _ in kept))
+        labels = [label.encode() for _, label, _, _ in kept]
+        self.label_starts = array('q', [0])
+        for label in labels:
+            self.label_starts.append(self.label_starts[-1] + len(label))
+        self.label_blob = b''.join(labels)
+
+        entries = sorted((key, index) for index, (_, _, _, keys) in enumerate(kept) for key in keys)
+        self.key_starts = array('q', [0])
+        for key, _ in entries:
+            self.key_starts.append(self.key_starts[-1] + len(key) + 1)
+        self.key_blob = '\n'.join(key for key, _ in entries) + '\n'
+        self.entry_items = array('q', (index for _, index in entries))
+
+        self.size = 1
+        while self.size < len(entries):
+            self.size *= 2
+        self.tree = array('q', [-1]) * (2 * self.size)
+        self.tree[self.size:self.size + len(entries)] = array('q', (kept[index][2] for _, index in entries))
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def __len__(self):
+        return len(self.entry_items)
+
+    def key(self, position):
+        return self.key_blob[self.key_starts[position]:self.key_starts[position + 1] - 1]
+
+    def label(self, index):
+        return self.label_blob[self.label_starts[index]:self.label_starts[index + 1]].decode()
+
+    def find(self, code):
+        index = bisect.bisect_left(self.codes, code)
+        return index if index < len(self.codes) and self.codes[index] == code else None
+
+    def key_range(self, prefix):
+        positions = range(len(self))
+        return (bisect.bisect_left(positions, prefix, key=self.key),
+                bisect.bisect_left(positions, _upper_bound(prefix), key=self.key))
+
+    def set_weight(self, position, weight):
+        node = self.size + position
+        self.tree[node] = weight
+        while node > 1:
+            node //= 2
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def remove(self, index):
+        """
+        Hide item `index`, returns its weight, or None if it was hidden already.
+        """
+        weight = None
+        for key in _keys(self.label(index)):
+            start, end = self.key_range(key)
+            for position in range(start, end):
+                if self.entry_items[position] == index and self.tree[self.size + position] >= 0:
+                    weight = self.tree[self.size + position]
+                    self.set_weight(position, -1)
+        return weight
+
+    def heaviest(self, start, end):
+        """
+        Yield (item index, weight) of the entries in [start, end), heaviest first.
+        """
+        heap = []
+        low, high = start + self.size, end + self.size
+        while low < high:
+            if low & 1:
+                heap.append((-self.tree[low], low))
+                low += 1
+            if high & 1:
+                high -= 1
+                heap.append((-self.tree[high], high))
+            low //= 2
+            high //= 2
+        heapq.heapify(heap)
+        while heap:
+            weight, node = heapq.heappop(heap)
+            if weight > 0:
+                # Only removed entries are left.
+                return
+            if node >= self.size:
+                yield self.entry_items[node - self.size], -weight
+            else:
+                heapq.heappush(heap, (-self.tree[2 * node], 2 * node))
+                heapq.heappush(heap, (-self.tree[2 * node + 1], 2 * node + 1))
+
+
+class SuggestIndex:
+    """
+    In-memory prefix index of normalized book titles and author names for
+    search-box autocompletion, ranked by popularity (the views of the book,
+    or of all the author's books). Every word sequence of a name starting
+    within its first WORD_KEYS words is a key, so "di tuoi" finds
+    "Cho tôi xin một vé đi tuổi thơ".
+
+    At most SUGGEST_MAX_ENTRIES keys are held, the most popular names first,
+    which bounds memory on large catalogues. Kept current by the Book and
+    Author signal handlers and rebuilt every SUGGEST_RELOAD_INTERVAL seconds
+    in the background to refresh the weights.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._delta = []
+        self._delta_items = {}
+        self._pending = None
+        self._loaded_at = None
+
+    def load(self):
+        books = Book.objects.values_list('id', 'title', 'stats__view_count')
+        authors = Author.objects.annotate(views=Sum('books__stats__view_count')).values_list('id', 'name', 'views')
+        items = [(_encode(BOOK, pk), label, views or 0) for pk, label, views in books.iterator(chunk_size=10000)]
+        items += [(_encode(AUTHOR, pk), label, views or 0) for pk, label, views in authors.iterator(chunk_size=10000)]
+        snapshot = _Snapshot(items, settings.SUGGEST_MAX_ENTRIES)
+
+        with self._lock:
+            pending = self._pending or []
+            self._snapshot, self._delta, self._delta_items = snapshot, [], {}
+            self._pending = None
+            self._loaded_at = time.monotonic()
+            # Changes made while the snapshot was being read.
+            for code, label in pending:
+                self._apply(code, label)
+
+    def _reload_in_background(self):
+        try:
+            self.load()
+        except Exception:
+            logger.exception('Failed to reload the suggestion index')
+            with self._lock:
+                self._pending = None
+        finally:
+            close_old_connections()
+
+    def _schedule_reload(self):
+        # Called with the lock held.
+        if self._pending is None:
+            self._pending = []
+            threading.Thread(target=self._reload_in_background, name='suggest-reload', daemon=True).start()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            self.load()
+        elif time.monotonic() - self._loaded_at > settings.SUGGEST_RELOAD_INTERVAL:
+            with self._lock:
+                self._schedule_reload()
+
+    def _forget(self, code):
+        """
+        Remove `code` from the index, returns its weight. Called with the lock held.
+        """
+        if code in self._delta_items:
+            label, weight = self._delta_items.pop(code)
+            for key in _keys(label):
+                entry = f'{key}\0{code}'
+                position = bisect.bisect_left(self._delta, entry)
+                if position < len(self._delta) and self._delta[position] == entry:
+                    del self._delta[position]
+            return weight
+        index = self._snapshot.find(code)
+        weight = self._snapshot.remove(index) if index is not None else None
+        return weight or 0
+
+    def _apply(self, code, label):
+        weight = self._forget(code)
+        if label is None:
+            return
+        for key in _keys(label):
+            bisect.insort(self._delta, f'{key}\0{code}')
+        self._delta_items[code] = (label, weight)
+        if len(self._delta) > MAX_DELTA_ENTRIES:
+            self._schedule_reload()
+
+    def _change(self, kind, pk, label):
+        with self._lock:
+            if self._snapshot is None:
+                # Not loaded yet, the first load reads it from the database.
+                return
+            if self._pending is not None:
+                self._pending.append((_encode(kind, pk), label))
+            self._apply(_encode(kind, pk), label)
+
+    def update(self, kind, pk, label):
+        """
+        Add or rename one book or author, keeping its weight.
+        """
+        self._change(kind, pk, label)
+
+    def remove(self, kind, pk):
+        self._change(kind, pk, None)
+
+    def suggest(self, query, limit=10):
+        """
+        Up to `limit` books and authors with a key starting with `query`
+        (normalized), most popular first.
+        """
+        prefix = normalize(query)[:KEY_LENGTH]
+        if not prefix:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            snapshot = self._snapshot
+            found = {}
+            for index, weight in snapshot.heaviest(*snapshot.key_range(prefix)):
+                found.setdefault(snapshot.codes[index], (weight, snapshot.label(index)))
+                if len(found) == limit:
+                    break
+            start = bisect.bisect_left(self._delta, prefix)
+            end = bisect.bisect_left(self._delta, _upper_bound(prefix), lo=start)
+            for entry in self._delta[start:end]:
+                code = int(entry[entry.rindex('\0') + 1:])
+                label, weight = self._delta_items[code]
+                found[code] = (weight, label)
+
+        best = heapq.nsmallest(limit, found.items(), key=lambda item: (-item[1][0], item[0]))
+        return [{'type': kind, 'id': pk, 'label': label}
+                for (kind, pk), (_, label) in ((_decode(code), value) for code, value in best)]
+
+
+suggestions = SuggestIndex()
@@ -1 +1,98 @@
-# Create your tests here.
+import io
+import zipfile
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from .importer import EPUB, InvalidImport, import_chapters
+from .models import Author, Book, BookStats, Chapter, CustomUser, History
+
+
+def make_book(title='Book', chapters=1):
+    author = Author.objects.create(name='Author')
+    book = Book.objects.create(author=author, title=title)
+    for number in range(1, chapters + 1):
+        chapter = Chapter(book=book, chapter_number=number, title=f'Chapter {number}')
+        chapter.content = f'Text of chapter {number}.'
+        chapter.save()
+    return book
+
+
+@override_settings(VIEW_BUFFER_FLUSH_INTERVAL=0, VIEW_DEBOUNCE_SECONDS=0)
+class ChapterRetrieveTests(APITestCase):
+    def setUp(self):
+        self.book = make_book()
+        self.chapter = self.book.chapters.get()
+        self.url = f'/api/bookly/chapter/{self.chapter.pk}/'
+
+    def test_not_modified_read_is_recorded(self):
+        first, second = (CustomUser.objects.create(username=name) for name in ('first', 'second'))
+        self.client.force_authenticate(first)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(second)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(History.objects.filter(chapter=self.chapter).count(), 2)
+        self.assertEqual(BookStats.objects.get(book=self.book).view_count, 2)
+
+    def test_invalid_page_is_not_a_read(self):
+        for url in (self.url, f'/api/bookly/read/{self.chapter.pk}'):
+            self.assertEqual(self.client.get(url, {'page': 5}).status_code, 404)
+            self.assertEqual(self.client.get(url, {'page': 'x'}).status_code, 400)
+        self.assertFalse(History.objects.exists())
+        self.assertEqual(self.client.get(self.url, {'page': 0}).status_code, 200)
+        self.assertEqual(History.objects.count(), 1)
+
+
+class RecentUpdatesTests(APITestCase):
+    def test_without_cursor_returns_ten_books(self):
+        for number in range(12):
+            make_book(f'Book {number}')
+        response = self.client.get('/api/bookly/recentUpdates/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 10)
+
+
+def make_epub(manifest):
+    source = io.BytesIO()
+    with zipfile.ZipFile(source, 'w') as archive:
+        archive.writestr('META-INF/container.xml',
+                         '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+                         '<rootfiles><rootfile full-path="content.opf"/></rootfiles></container>')
+        archive.writestr('content.opf',
+                         '<package xmlns="http://www.idpf.org/2007/opf">'
+                         f'<manifest>{manifest}</manifest><spine><itemref idref="c1"/></spine></package>')
+        archive.writestr('c1.xhtml', '<html><body><h1>Chapter 1: Start</h1><p>Text.</p></body></html>')
+    source.seek(0)
+    return source
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.book = make_book(chapters=0)
+
+    def test_epub(self):
+        source = make_epub('<item id="c1" href="c1.xhtml" media-type="application/xhtml+xml"/>')
+        result = import_chapters(self.book, source, EPUB)
+        self.assertEqual((result['chapters'], result['first_chapter']), (1, '1.00'))
+        self.assertEqual(self.book.chapters.get().title, 'Start')
+
+    def test_epub_manifest_item_without_href(self):
+        source = make_epub('<item id="c1" media-type="application/xhtml+xml"/>')
+        with self.assertRaises(InvalidImport):
+            import_chapters(self.book, source, EPUB)
+        self.assertFalse(self.book.chapters.exists())
+
+
+class SearchIndexTests(TestCase):
+    @override_settings(SEARCH_INDEX_CHAPTERS=False)
+    def test_chapter_save_does_not_read_text_when_not_indexed(self):
+        chapter = Chapter.objects.get(pk=make_book().chapters.get().pk)
+        chapter.title = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            chapter.save()
+        self.assertFalse([query for query in queries if 'bookly_chaptercontent' in query['sql']])
@@ -0,0 +1,34 @@
+import unicodedata
+
+
+def normalize(text):
+    """
+    Fold `text` for matching what users type: compatibility forms, case and
+    diacritics are dropped (Vietnamese đ becomes d) and whitespace runs
+    collapse to one space. "  Mắt  BIẾC " -> "mat biec".
+    """
+    text = unicodedata.normalize('NFKD', text.replace('đ', 'd').replace('Đ', 'D'))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def paginate(text, page_chars):
+    """
+    Start offsets of the pages of `text`, pages of at most about `page_chars`
+    characters. A page ends after the last paragraph break that fits, or the
+    last space, and is only cut mid-word when it has neither.
+    """
+    offsets = [0]
+    start = 0
+    while len(text) - start > page_chars:
+        end = start + page_chars
+        cut = text.rfind('\n', start + 1, end + 1)
+        if cut < 0:
+            cut = text.rfind(' ', start + 1, end + 1)
+        start = cut + 1 if cut >= 0 else end
+        offsets.append(start)
+    return offsets
@@ -0,0 +1,118 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Book, BookViewBucket, Genre, TrendingEntry
+
+
+BUCKET_LENGTHS = {
+    BookViewBucket.HOUR: timedelta(hours=1),
+    BookViewBucket.DAY: timedelta(days=1),
+}
+
+
+def bucket_start(when, granularity):
+    when = timezone.localtime(when).replace(minute=0, second=0, microsecond=0)
+    if granularity == BookViewBucket.DAY:
+        when = when.replace(hour=0)
+    return when
+
+
+def record_views(counts, when=None):
+    """
+    Add reads to the hourly and daily buckets, `counts` maps book ids to the
+    number of reads that happened at `when`.
+    """
+    when = when or timezone.now()
+    for granularity in BUCKET_LENGTHS:
+        start = bucket_start(when, granularity)
+        for book_id, count in counts.items():
+            buckets = BookViewBucket.objects.filter(book_id=book_id, granularity=granularity, start=start)
+            if buckets.update(views=F('views') + count):
+                continue
+            try:
+                with transaction.atomic():
+                    BookViewBucket.objects.create(book_id=book_id, granularity=granularity, start=start, views=count)
+            except IntegrityError:
+                # Somebody else created the bucket in between.
+                buckets.update(views=F('views') + count)
+
+
+def _windows(now):
+    # Hourly buckets cover whole days back to `hourly_since`, daily buckets the time before it.
+    hourly_since = bucket_start(now - timedelta(hours=settings.TRENDING_HOURLY_WINDOW_HOURS), BookViewBucket.DAY)
+    daily_since = bucket_start(now - timedelta(days=settings.TRENDING_DAILY_WINDOW_DAYS), BookViewBucket.DAY)
+    return hourly_since, daily_since
+
+
+def compute_scores(now=None):
+    """
+    Score every book with reads in the trending window. Each bucket counts
+    for its views halved every TRENDING_HALF_LIFE_HOURS of age.
+    """
+    now = now or timezone.now()
+    hourly_since, daily_since = _windows(now)
+    half_life = timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+
+    buckets = BookViewBucket.objects.filter(
+        Q(granularity=BookViewBucket.HOUR, start__gte=hourly_since)
+        | Q(granularity=BookViewBucket.DAY, start__gte=daily_since, start__lt=hourly_since)
+    ).values_list('book_id', 'granularity', 'start', 'views')
+
+    scores = defaultdict(float)
+    for book_id, granularity, start, views in buckets:
+        age = now - (start + BUCKET_LENGTHS[granularity] / 2)
+        scores[book_id] += views * 0.5 ** (max(age, timedelta(0)) / half_life)
+    return scores
+
+
+def refresh_rankings(now=None):
+    """
+    Recompute the overall and per-genre leaderboards and prune buckets that
+    fell out of the window.
+    """
+    now = now or timezone.now()
+    scores = compute_scores(now)
+    size = settings.TRENDING_LIST_SIZE
+
+    def top(book_ids):
+        return heapq.nlargest(size, ((scores[book_id], book_id) for book_id in book_ids if book_id in scores))
+
+    genre_books = defaultdict(list)
+    for genre_id, book_id in Genre.books.through.objects.values_list('genre_id', 'book_id'):
+        genre_books[genre_id].append(book_id)
+
+    entries = [
+        TrendingEntry(genre_id=None, rank=rank, book_id=book_id, score=score)
+        for rank, (score, book_id) in enumerate(top(scores), start=1)
+    ]
+    for genre_id, book_ids in genre_books.items():
+        entries += [
+            TrendingEntry(genre_id=genre_id, rank=rank, book_id=book_id, score=score)
+            for rank, (score, book_id) in enumerate(top(book_ids), start=1)
+        ]
+
+    hourly_since, daily_since = _windows(now)
+    with transaction.atomic():
+        TrendingEntry.objects.all().delete()
+        TrendingEntry.objects.bulk_create(entries, batch_size=1000)
+        BookViewBucket.objects.filter(granularity=BookViewBucket.HOUR, start__lt=hourly_since).delete()
+        BookViewBucket.objects.filter(granularity=BookViewBucket.DAY, start__lt=daily_since).delete()
+    return len(entries)
+
+
+def get_trending(number, genre_id=None, queryset=None):
+    """
+    Top `number` trending books overall or in one genre, in rank order,
+    fetched from `queryset` (which may be a values() queryset).
+    """
+    queryset = Book.objects.for_list() if queryset is None else queryset
+    entries = TrendingEntry.objects.filter(genre_id=genre_id).order_by('rank')[:number]
+    book_ids = list(entries.values_list('book_id', flat=True))
+    books = {book['id'] if isinstance(book, dict) else book.pk: book for book in queryset.filter(pk__in=book_ids)}
+    return [books[book_id] for book_id in book_ids if book_id in books]
@@ -3,8 +3,9 @@ from rest_framework.routers import SimpleRouter
 
 from .views import Test, HomePageView, BookViewSet, ChapterViewSet, BookmarkViewSet
 from .views import GetBookOfAuthorView, GetInfoOfAuthorView
-from .views import CommentView, ReviewView, HistoryView, FollowView
-from .views import QueryView, QueryAuthorView, QueryBookView,  GetRecentUpdatesView
+from .views import CommentView, ReviewView, HistoryView, FollowView, ProgressSyncView
+from .views import QueryView, QueryAuthorView, QueryBookView, QueryChapterView, SuggestView, GetRecentUpdatesView, TrendingView
+from .views import BookImportView, GenreBooksView, ReaderView
 
 router = SimpleRouter()
 router.register(r'book', BookViewSet, basename='book')
@@ -20,11 +21,19 @@ urlpatterns = [
                   path('search/', QueryView.as_view(), name='search'),
                   path('search/author', QueryAuthorView.as_view(), name='search-author'),
                   path('search/book', QueryBookView.as_view(), name='search-book'),
+                  path('search/chapter', QueryChapterView.as_view(), name='search-chapter'),
+                  path('search/suggest', SuggestView.as_view(), name='search-suggest'),
                   
+                  path('book/<int:pk>/import', BookImportView.as_view(), name='book-import'),
+
+                  path('read/<int:id>', ReaderView.as_view(), name='read'),
                   path('comment/<int:id>/', CommentView.as_view(), name='comment'),
                   path('review/<int:id>/', ReviewView.as_view(), name='review'),
 
                   path('history/', HistoryView.as_view(), name='history'),
+                  path('progress/sync', ProgressSyncView.as_view(), name='progress-sync'),
                   path('follow/', FollowView.as_view(), name='follow'),
                   path('recentUpdates/', GetRecentUpdatesView.as_view(), name='recent-updates'),
+                  path('trending/', TrendingView.as_view(), name='trending'),
+                  path('genre/books', GenreBooksView.as_view(), name='genre-books'),
               ] + router.urls
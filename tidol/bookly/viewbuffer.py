@@ -0,0 +1,131 @@
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Chapter, History
+from .signals import ViewEvent, views_recorded
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the (reader, chapter) pairs remembered for debouncing.
+MAX_RECENT_READS = 100000
+
+
+def reader_key(request):
+    """
+    Stable identifier of whoever sent the request: the user id, or for guests
+    the session key if there is one, otherwise a hash of address and user agent.
+    """
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+    if session_key:
+        return f'session:{session_key}'
+    raw = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return 'guest:' + hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def write_views(views):
+    """
+    Upsert a batch of ViewEvent into History, then send views_recorded.
+    """
+    if not views:
+        return
+    # Chapters may have been deleted while their reads sat in the buffer.
+    chapter_ids = set(Chapter.objects.filter(pk__in={view.chapter_id for view in views}).values_list('pk', flat=True))
+    views = [view for view in views if view.chapter_id in chapter_ids]
+    if not views:
+        return
+
+    book_ids = {view.chapter_id: view.book_id for view in views}
+    rows = History.objects.bulk_record((view.user_id, view.chapter_id, view.timestamp) for view in views)
+    new_views = Counter(book_ids[chapter_id] for _, _, chapter_id, created in rows if created)
+    views_recorded.send(sender=History, views=views, new_views=dict(new_views))
+
+
+class ViewBuffer:
+    """
+    In-process write-behind queue for chapter reads. Requests only append to
+    a list; a daemon thread writes the batch every VIEW_BUFFER_FLUSH_INTERVAL
+    seconds, or as soon as VIEW_BUFFER_MAX_SIZE reads are waiting. Repeated
+    reads of a chapter by the same reader within VIEW_DEBOUNCE_SECONDS are
+    dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = []
+        self._recent = OrderedDict()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _is_debounced(self, key, now):
+        window = settings.VIEW_DEBOUNCE_SECONDS
+        while self._recent:
+            oldest_time = next(iter(self._recent.values()))
+            if now - oldest_time < window and len(self._recent) < MAX_RECENT_READS:
+                break
+            self._recent.popitem(last=False)
+        last = self._recent.get(key)
+        if last is not None and now - last < window:
+            return True
+        self._recent[key] = now
+        self._recent.move_to_end(key)
+        return False
+
+    def record(self, chapter, request):
+        """
+        Queue a read of `chapter`, returns False if it was debounced.
+        """
+        reader = reader_key(request)
+        user_id = request.user.pk if request.user.is_authenticated else None
+        view = ViewEvent(chapter.pk, chapter.book_id, user_id, reader, timezone.now())
+
+        with self._lock:
+            if self._is_debounced((reader, chapter.pk), time.monotonic()):
+                return False
+
+        if not settings.VIEW_BUFFER_FLUSH_INTERVAL:
+            # Buffering is disabled, write through.
+            write_views([view])
+            return True
+
+        with self._lock:
+            self._views.append(view)
+            full = len(self._views) >= settings.VIEW_BUFFER_MAX_SIZE
+            self._start()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        with self._lock:
+            views, self._views = self._views, []
+        write_views(views)
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='view-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.VIEW_BUFFER_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush buffered chapter views')
+            finally:
+                close_old_connections()
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.flush)
@@ -1,4 +1,6 @@
-from django.db.models import Max
+from django.conf import settings
+from django.db.models import Count, Exists, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.http import QueryDict
 from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import get_object_or_404
@@ -7,12 +9,28 @@ from rest_framework import viewsets
 from rest_framework import permissions
 from rest_framework import serializers
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
-
-from .models import Author, Book, Chapter, Comment, Review, Bookmark, CustomUser, Follow, History
+from rest_framework.utils.urls import replace_query_param
+
+from .conditional import Validators
+from .fastpath import book_rows, follow_rows, history_rows
+from .genres import bitmap_ids, genre_index
+from .homepage import MAX_NUMBER, get_snapshot, get_spotlight
+from .importer import InvalidImport, guess_format, import_chapters
+from .models import Author, Book, Chapter, ChapterContent, Comment, Review, Bookmark, CustomUser, Follow, Genre, History
+from .pagination import BookPagination, BookmarkPagination, CommentPagination, FollowPagination, HistoryPagination, ReviewPagination
+from .pagination import RecentUpdatesPagination, decode_cursor, encode_cursor
 from .permissions import IsAuthor, IsAuthorOf
-from .serializers import AuthorSerializer, BookSerializer, BookDetailSerializer, ChapterSerializer, CommentSerializer, ReviewSerializer, BookmarkSerializer, FollowSerializer, HistorySerializer
+from .progress import sync_progress
+from .readers import author_unique_readers
+from .serializers import AuthorSerializer, BookSerializer, BookDetailSerializer, ChapterSerializer, CommentSerializer, ReviewSerializer, BookmarkSerializer
+from .search import search
+from .serializers import ProgressSyncSerializer, ReaderChapterSerializer, requested_fields
+from .streaming import stream_rows, wants_stream
+from .suggest import suggestions
+from .trending import get_trending
+from .viewbuffer import view_buffer
 
 
 class Test(views.APIView):
@@ -23,48 +41,17 @@ class Test(views.APIView):
 class HomePageView(views.APIView):
     def get(self, request, format=None):
         number = int(request.query_params.get('number', '5'))
+        number = min(max(number, 1), MAX_NUMBER)
         
-        sportlight=[]
-        last_updated_books=[]
-        popular_books=[]
-        last_added_books=[]
-        
-        
-        query_set = Book.objects.all()
-        
-        sportlight = query_set.order_by('?')[:number]
-        # last_updated_books = Book.objects.annotate(
-        #     latest_chapter_updated=Max('chapters__lastupdated')
-        # ).order_by('-latest_chapter_updated')[:5]
-        last_updated_books = sorted(
-            [book for book in query_set if book.get_lastest_chapter() is not None], 
-            key=lambda book: book.get_lastest_chapter().lastupdated, 
-            reverse=True
-        )[:number]
-        
-        popular_books = sorted(
-            query_set, 
-            key=lambda book: book.count_views(), 
-            reverse=True
-        )[:number]
-        
-        last_added_books = sorted(
-            [book for book in query_set if book.get_first_chapter() is not None],
-            key=lambda book: book.get_first_chapter().created,
-        )[:number]
-        
-        
-        sport_light_serializer = BookSerializer(sportlight, many=True)
-        last_updated_books_serializer = BookSerializer(last_updated_books, many=True)
-        popular_books_serializer = BookSerializer(popular_books, many=True)
-        last_added_books_serializer = BookSerializer(last_added_books, many=True)
+        snapshot = get_snapshot(number)
+        age = int(snapshot.age())
     
         return Response({
-                        'sportlight': sport_light_serializer.data,
-                        'last_updated_books': last_updated_books_serializer.data, 
-                        'popular_books': popular_books_serializer.data, 
-                        'last_added_books': last_added_books_serializer.data
-                        }, status=status.HTTP_200_OK)
+                        'sportlight': get_spotlight(number),
+                        **snapshot.data,
+                        'generated_at': snapshot.generated_at,
+                        'age': age,
+                        }, status=status.HTTP_200_OK, headers={'Age': str(age)})
 
 
 class GetBookOfAuthorView(views.APIView):
@@ -81,8 +68,10 @@ class GetBookOfAuthorView(views.APIView):
             return Response(status=status.HTTP_400_BAD_REQUEST)
             
         books = Book.objects.filter(author=author)
-        serializers = BookSerializer(books, many=True)
-        return Response(serializers.data, status=status.HTTP_200_OK)
+        rows = book_rows.for_request(request)
+        if wants_stream(request):
+            return stream_rows(books.order_by('id'), rows)
+        return Response(rows.serialize(books), status=status.HTTP_200_OK)
 
 
 class GetInfoOfAuthorView(views.APIView):
@@ -102,14 +91,20 @@ class GetInfoOfAuthorView(views.APIView):
 
 
 class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
-    pagination_class=PageNumberPagination
+    queryset = Book.objects.for_list()
+    pagination_class = BookPagination
 
     def get_serializer_class(self):
         if self.action in ['retrieve']:
             return BookDetailSerializer
         return BookSerializer
 
+    def get_queryset(self):
+        # The list selects its own columns, see book_rows, for_list() would only add joins.
+        if self.action == 'list':
+            return Book.objects.all()
+        return super().get_queryset()
+
     def get_permissions(self):
         if self.action in ['retrieve', 'list', ]:
             return [permissions.AllowAny(), ]
@@ -137,9 +132,39 @@ class BookViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def get_validators(self, request):
+        """
+        Validators of the book detail, None when the book does not exist. The
+        detail says whether the user follows the book and has read each
+        chapter, so for users the ETag covers that too. There is no
+        Last-Modified: deleting a chapter or renaming the author changes the
+        detail without bumping any timestamp, only the ETag sees it.
+        """
+        if not self.kwargs['pk'].isdigit():
+            return None
+        books = Book.objects.filter(pk=self.kwargs['pk'])
+        user = request.user if request.user.is_authenticated else None
+        if user is not None:
+            books = books.annotate(
+                followed=Exists(Follow.objects.filter(user=user, book=OuterRef('pk'))),
+                last_read=Subquery(History.objects.filter(user=user, chapter__book=OuterRef('pk'))
+                                   .order_by('-timestamp').values('timestamp')[:1]),
+            )
+        fields = ['lastupdated', 'author__name', 'stats__chapter_count', 'stats__latest_chapter_update']
+        row = books.values(*fields, *(['followed', 'last_read'] if user is not None else [])).first()
+        if row is None:
+            return None
+        return Validators(user.pk if user is not None else None, *row.values(), vary=['Authorization', 'Cookie'])
+
     # GET
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        validators = self.get_validators(request)
+        if validators is not None:
+            not_modified = validators.not_modified(request)
+            if not_modified is not None:
+                return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return validators.apply(response) if validators is not None else response
 
     # PUT
     def update(self, request, *args, **kwargs):
@@ -162,7 +187,52 @@ class BookViewSet(viewsets.ModelViewSet):
     
     # GET
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        rows = book_rows.for_request(request)
+        books = rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(books)
+        if page is not None:
+            return self.get_paginated_response(rows.map(page))
+        return Response(rows.map(books))
+
+
+def get_content_range(request, chapter, length):
+    """
+    (start, end, page) of the part of the text asked for with ?page=N
+    (counted from 0, like Bookmark.page) or ?offset=&length= (in
+    characters), None for all of it. Raises ValueError or IndexError.
+    """
+    params = request.query_params
+    if 'page' in params:
+        body = getattr(chapter, 'body', None) or ChapterContent()
+        page = int(params['page'])
+        return (*body.page_range(page, length), page)
+    if 'offset' in params:
+        start = int(params['offset'])
+        size = int(params.get('length', settings.CHAPTER_PAGE_CHARS))
+        if start < 0 or size < 1 or (start >= length and length):
+            raise IndexError(start)
+        return start, min(start + size, length), None
+    return None
+
+
+def apply_content_range(request, chapter, data):
+    """
+    Cut data['content'] down to the part asked for (see get_content_range())
+    and describe it in data['content_range']. Returns an error Response when
+    the range is invalid, otherwise None.
+    """
+    text = data['content']
+    try:
+        content_range = get_content_range(request, chapter, len(text))
+    except ValueError:
+        return Response({'error': 'page, offset and length must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    except IndexError:
+        return Response({'error': 'Page not found.'}, status=status.HTTP_404_NOT_FOUND)
+    if content_range is not None:
+        start, end, page = content_range
+        data['content'] = text[start:end]
+        data['content_range'] = {'page': page, 'start': start, 'end': end, 'length': len(text)}
+    return None
 
 
 class ChapterViewSet(viewsets.ModelViewSet):
@@ -170,6 +240,16 @@ class ChapterViewSet(viewsets.ModelViewSet):
 
     serializer_class = ChapterSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in permissions.SAFE_METHODS:
+            fields = requested_fields(self.request, ChapterSerializer.Meta.fields)
+            if fields is None or 'content' in fields:
+                queryset = queryset.with_content()
+            elif {'word_count', 'reading_time', 'page_count'} & set(fields):
+                queryset = queryset.with_content(text=False)
+        return queryset
+
     def get_permissions(self):
         if self.action == 'retrieve':
             return [permissions.AllowAny(), ]
@@ -180,16 +260,43 @@ class ChapterViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    def get_validators(self, request):
+        """
+        (chapter, validators) from the chapter's timestamps and content hash,
+        without reading its text, or (None, None) when it does not exist.
+        The chapter only has its id and book_id.
+        """
+        if not self.kwargs['pk'].isdigit():
+            return None, None
+        row = Chapter.objects.filter(pk=self.kwargs['pk']).values('book_id', 'lastupdated', 'body__sha256').first()
+        if row is None:
+            return None, None
+        # The same chapter is a different response with other ?page=, ?fields=...
+        params = sorted((key, request.query_params.getlist(key))
+                        for key in ('fields', 'omit', 'page', 'offset', 'length') if key in request.query_params)
+        validators = Validators(row['lastupdated'], row['body__sha256'], params, settings.CHAPTER_PAGE_CHARS,
+                                last_modified=row['lastupdated'])
+        # An int pk, like a fetched chapter, for the view buffer's lookups and debounce keys.
+        return Chapter(pk=int(self.kwargs['pk']), book_id=row['book_id']), validators
+
     def retrieve(self, request, *args, **kwargs):
-        user = request.user
-        if not user.is_authenticated:
-            user = None
-        try:
-            history_record = History(user=user, chapter=self.get_object())
-            history_record.save() 
-        except History.DoesNotExist:
-            History.objects.create(user=user, chapter=self.get_object())
-        return super().retrieve(request, *args, **kwargs)
+        chapter, validators = self.get_validators(request)
+        if validators is not None:
+            not_modified = validators.not_modified(request)
+            if not_modified is not None:
+                # A read all the same.
+                view_buffer.record(chapter, request)
+                return not_modified
+        chapter = self.get_object()
+        serializer = self.get_serializer(chapter)
+        data = serializer.data
+        if 'content' in data:
+            error = apply_content_range(request, chapter, data)
+            if error is not None:
+                return error
+        # Queued, the History row is written in the background.
+        view_buffer.record(chapter, request)
+        return validators.apply(Response(data))
 
     def update(self, request, *args, **kwargs):
         return Response({'error': 'Method not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -207,6 +314,7 @@ class ChapterViewSet(viewsets.ModelViewSet):
 class BookmarkViewSet(viewsets.ModelViewSet):
     queryset = Bookmark.objects.all()
     serializer_class = BookmarkSerializer
+    pagination_class = BookmarkPagination
 
     def get_permissions(self):
         if self.action in ['retrieve', 'create', ]:
@@ -232,10 +340,11 @@ class BookmarkViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         user = request.user
-        bookmarks = Bookmark.objects.filter(user=user)
+        bookmarks = Bookmark.objects.filter(user=user).select_related('chapter__book')
 
-        serializers = BookmarkSerializer(bookmarks, many=True)
-        return Response(serializers.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(bookmarks)
+        serializers = BookmarkSerializer(page, many=True)
+        return self.get_paginated_response(serializers.data)
 
     # PUT
     def update(self, request, *args, **kwargs):
@@ -275,6 +384,70 @@ class BookmarkViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
+class ReaderView(views.APIView):
+    """
+    Everything the reader shows when a chapter is opened: the chapter (one
+    page of it with ?page=N, see get_content_range()), the book header, the
+    previous and next chapters by chapter_number, the comment count and the
+    user's latest bookmark in the chapter. With ?prefetch=next the next
+    chapter also carries its first page.
+
+    Two queries, three for signed-in users, however long the book.
+    """
+    permission_classes = [permissions.AllowAny, ]
+
+    def get(self, request, id, format=None):
+        siblings = Chapter.objects.filter(book=OuterRef('book'))
+        comments = Comment.objects.filter(chapter=OuterRef('pk')).values('chapter').annotate(count=Count('pk'))
+        chapter = Chapter.objects.with_content().select_related('book__author', 'book__stats').annotate(
+            previous_id=Subquery(siblings.filter(chapter_number__lt=OuterRef('chapter_number'))
+                                 .order_by('-chapter_number').values('pk')[:1]),
+            next_id=Subquery(siblings.filter(chapter_number__gt=OuterRef('chapter_number'))
+                             .order_by('chapter_number').values('pk')[:1]),
+            comment_count=Coalesce(Subquery(comments.values('count')), 0),
+        ).filter(pk=id).first()
+        if chapter is None:
+            return Response({'error': 'Chapter not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        data = ReaderChapterSerializer(chapter).data
+        error = apply_content_range(request, chapter, data)
+        if error is not None:
+            return error
+        view_buffer.record(chapter, request)
+
+        prefetch = request.query_params.get('prefetch') == 'next' and chapter.next_id is not None
+        neighbours = Chapter.objects.filter(pk__in=[pk for pk in (chapter.previous_id, chapter.next_id) if pk])
+        neighbours = {neighbour.pk: neighbour for neighbour in (neighbours.with_content() if prefetch else neighbours)}
+
+        def neighbour(pk):
+            if pk not in neighbours:
+                return None
+            return {'id': pk, 'title': neighbours[pk].title, 'chapter_number': str(neighbours[pk].chapter_number)}
+
+        following = neighbour(chapter.next_id)
+        if prefetch and following is not None:
+            next_chapter = neighbours[chapter.next_id]
+            next_text = next_chapter.content
+            body = getattr(next_chapter, 'body', None) or ChapterContent()
+            start, end = body.page_range(0, len(next_text))
+            following['content'] = next_text[start:end]
+            following['content_range'] = {'page': 0, 'start': start, 'end': end, 'length': len(next_text)}
+
+        bookmark = None
+        if request.user.is_authenticated:
+            bookmark = (Bookmark.objects.filter(user=request.user, chapter=chapter).order_by('-timestamp')
+                        .values('id', 'page', 'timestamp').first())
+
+        return Response({
+            'chapter': data,
+            'book': BookSerializer(chapter.book).data,
+            'previous': neighbour(chapter.previous_id),
+            'next': following,
+            'comment_count': chapter.comment_count,
+            'bookmark': bookmark,
+        })
+
+
 class CommentView(views.APIView):
     # Send comment
     def post(self, request, id, format=None):
@@ -315,15 +488,12 @@ class CommentView(views.APIView):
     # Retrieve comments
     def get(self, request, id, format=None):
         chapter_id = id
+        comments = Comment.objects.filter(chapter=chapter_id).select_related('chapter__book')
         
-        try:
-            comments = Comment.objects.filter(chapter=chapter_id)
-        except Chapter.DoesNotExist:
-            chapter = get_object_or_404(Chapter, pk=chapter_id)
-            return Response([], status=status.HTTP_200_OK)
-        
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = CommentPagination()
+        page = paginator.paginate_queryset(comments, request, view=self)
+        serializer = CommentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ReviewView(views.APIView):
@@ -379,20 +549,22 @@ class ReviewView(views.APIView):
         
         book = get_object_or_404(Book, pk=book_id)
         
-        try:
-            all_reviews = Review.objects.filter(book=book_id)
-        except Book.DoesNotExist:
-            return Response({"my_review": None, "all_reviews": []}, status=status.HTTP_200_OK)
+        all_reviews = Review.objects.filter(book=book_id).select_related('book', 'user')
 
         try:
             my_review = Review.objects.get(user=user, book=book_id) if user.is_authenticated else None
         except ObjectDoesNotExist:
             my_review = None
 
+        paginator = ReviewPagination()
+        page = paginator.paginate_queryset(all_reviews, request, view=self)
         my_review_serializer_data = ReviewSerializer(my_review).data if my_review else None
-        all_reviews_serializer_data = ReviewSerializer(all_reviews, many=True).data
+        all_reviews_serializer_data = ReviewSerializer(page, many=True).data
         
-        return Response({"my_review": my_review_serializer_data, "all_reviews": all_reviews_serializer_data}, status=status.HTTP_200_OK)
+        data = {"my_review": my_review_serializer_data, "all_reviews": all_reviews_serializer_data}
+        if not paginator.legacy:
+            data.update(paginator.get_page_info())
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class FollowView(views.APIView):
@@ -417,14 +589,14 @@ class FollowView(views.APIView):
             return Response({'error': 'This user already follows this book'}, status=status.HTTP_400_BAD_REQUEST)
         
         Follow.objects.create(user=user, book=book)
-        serializers = FollowSerializer(Follow.get_follow_of_user(user), many=True)
-        return Response(serializers.data, status=status.HTTP_200_OK)
+        return Response(follow_rows.serialize(Follow.get_follow_of_user(user)), status=status.HTTP_200_OK)
     
     def get(self, request, format=None):
-        follows = Follow.get_follow_of_user(request.user)
+        follows = follow_rows.values(Follow.get_follow_of_user(request.user))
         
-        serializers = FollowSerializer(follows, many=True)
-        return Response(serializers.data, status=status.HTTP_200_OK)
+        paginator = FollowPagination()
+        page = paginator.paginate_queryset(follows, request, view=self)
+        return paginator.get_paginated_response(follow_rows.map(page))
 
     def delete(self, request, format=None):
         user = request.user
@@ -436,9 +608,7 @@ class FollowView(views.APIView):
         except Follow.DoesNotExist:
             return Response({'error': 'This user does not follow this book'}, status=status.HTTP_404_NOT_FOUND)
         following_book.delete()
-        
-        serializers = FollowSerializer(Follow.get_follow_of_user(user), many=True)
-        return Response(serializers.data, status=status.HTTP_200_OK)
+        return Response(follow_rows.serialize(Follow.get_follow_of_user(user)), status=status.HTTP_200_OK)
     
     def put(self, request, id, format=None):
         return Response({'error': 'Method not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -449,59 +619,223 @@ class FollowView(views.APIView):
    
 class HistoryView(views.APIView):
     permission_classes = [permissions.IsAuthenticated, ]
+    pagination_class = HistoryPagination
     
     def get(self, request, format=None):
         user = request.user
-        histories = History.objects.filter(user=user).order_by('-timestamp')
-        serializer = HistorySerializer(histories, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        rows = history_rows.for_request(request)
+        if wants_stream(request):
+            # The full history in one response, without holding it in memory.
+            histories = History.objects.filter(user=user).order_by(*self.pagination_class.ordering)
+            return stream_rows(histories, rows)
+        histories = rows.values(History.objects.filter(user=user))
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(histories, request, view=self)
+        return paginator.get_paginated_response(rows.map(page))
+
+
+class BookImportView(views.APIView):
+    """
+    Add the chapters of an uploaded text, Markdown or EPUB file (`file`) to
+    one of the author's books, all at once. The format comes from the file
+    name unless `format` is given.
+    """
+    permission_classes = [IsAuthor, IsAuthorOf, ]
+
+    def post(self, request, pk, format=None):
+        book = get_object_or_404(Book.objects.select_related('author__user'), pk=pk)
+        self.check_object_permissions(request, book)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or guess_format(upload.name)
+        try:
+            result = import_chapters(book, upload, file_format)
+        except InvalidImport as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
+class ProgressSyncView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, ]
+    
+    def post(self, request, format=None):
+        serializer = ProgressSyncSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        changes = sync_progress(request.user, serializer.validated_data['events'], serializer.validated_data['since'])
+        return Response(changes, status=status.HTTP_200_OK)
    
     
+def _search_books(request, query):
+    rows = book_rows.for_request(request)
+    hits = search('book', query)
+    books = {row['id']: row for row in rows.values(Book.objects.filter(pk__in=[pk for pk, _ in hits]))}
+    hits = [(pk, snippet) for pk, snippet in hits if pk in books]
+    return [{**book, 'snippet': snippet} for book, (_, snippet) in zip(rows.map(books[pk] for pk, _ in hits), hits)]
+
+
+def _search_authors(query):
+    hits = search('author', query)
+    authors = Author.objects.in_bulk([pk for pk, _ in hits])
+    hits = [(pk, snippet) for pk, snippet in hits if pk in authors]
+    data = AuthorSerializer([authors[pk] for pk, _ in hits], many=True,
+                            context={'unique_readers': author_unique_readers(list(authors))}).data
+    return [{**author, 'snippet': snippet} for author, (_, snippet) in zip(data, hits)]
+
+
 class QueryAuthorView(views.APIView):
     def get(self, request, format=None):
-        query = request.query_params.get('q')
-        authors = Author.objects.filter(name__icontains=query)
-        if authors.count() == 0:
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Missing search query.'}, status=status.HTTP_400_BAD_REQUEST)
+        authors = _search_authors(query)
+        if not authors:
             return Response({'error': 'No authors found.'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = AuthorSerializer(authors, many=True)
-        return Response(serializer.data)
+        return Response(authors)
 
 
 class QueryBookView(views.APIView):
     def get(self, request, format=None):
-        query = request.query_params.get('q')
-        books = Book.objects.filter(title__icontains=query)
-        if books.count() == 0:
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Missing search query.'}, status=status.HTTP_400_BAD_REQUEST)
+        books = _search_books(request, query)
+        if not books:
             return Response({'error': 'No books found.'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = BookSerializer(books, many=True)
-        return Response(serializer.data)
+        return Response(books)
+
+
+class QueryChapterView(views.APIView):
+    def get(self, request, format=None):
+        if not settings.SEARCH_INDEX_CHAPTERS:
+            return Response({'error': 'Chapter search is turned off.'}, status=status.HTTP_404_NOT_FOUND)
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Missing search query.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        hits = search('chapter', query)
+        chapters = Chapter.objects.filter(pk__in=[pk for pk, _ in hits]).values(
+            'id', 'title', 'chapter_number', 'book_id', 'book__title')
+        chapters = {chapter['id']: chapter for chapter in chapters}
+        results = [
+            {
+                'id': pk,
+                'title': chapters[pk]['title'],
+                'chapter_number': str(chapters[pk]['chapter_number']),
+                'book_id': chapters[pk]['book_id'],
+                'book_title': chapters[pk]['book__title'],
+                'snippet': snippet,
+            }
+            for pk, snippet in hits if pk in chapters
+        ]
+        if not results:
+            return Response({'error': 'No chapters found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(results)
+
+
+class SuggestView(views.APIView):
+    def get(self, request, format=None):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', '10'))
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), settings.SUGGEST_MAX_RESULTS)
+        return Response(suggestions.suggest(query, limit), status=status.HTTP_200_OK)
 
 
 class QueryView(views.APIView):
     def get(self, request, format=None):
-        query = request.query_params.get('q')
-        books = Book.objects.filter(title__icontains=query)
-        authors = Author.objects.filter(name__icontains=query)
-        if books.count() == 0 and authors.count() == 0:
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Missing search query.'}, status=status.HTTP_400_BAD_REQUEST)
+        books = _search_books(request, query)
+        authors = _search_authors(query)
+        if not books and not authors:
             return Response({'error': 'No books or authors found.'}, status=status.HTTP_404_NOT_FOUND)
-        book_serializer = BookSerializer(books, many=True)
-        author_serializer = AuthorSerializer(authors, many=True)
-        return Response({'books': book_serializer.data, 'authors': author_serializer.data}, status=status.HTTP_200_OK)
+        return Response({'books': books, 'authors': authors}, status=status.HTTP_200_OK)
 
 
-class GetRecentUpdatesView(views.APIView):
+class TrendingView(views.APIView):
     def get(self, request, format=None):
-        books = []
+        try:
+            number = int(request.query_params.get('number', '10'))
+            genre_id = request.query_params.get('genre')
+            genre_id = None if genre_id is None else int(genre_id)
+        except ValueError:
+            return Response({'error': 'number and genre must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        number = min(max(number, 1), settings.TRENDING_LIST_SIZE)
+        
+        if genre_id is not None and not Genre.objects.filter(pk=genre_id).exists():
+            return Response({'error': 'Genre not found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        rows = book_rows.for_request(request)
+        books = get_trending(number, genre_id, queryset=rows.values(Book.objects.all()))
+        return Response(rows.map(books), status=status.HTTP_200_OK)
+
+
+def _genre_ids(request, param):
+    value = request.query_params.get(param, '')
+    return [int(genre_id) for genre_id in value.split(',') if genre_id.strip()]
+
+
+class GenreBooksView(views.APIView):
+    """
+    Books by genre: ?all=1,2 (in every one of them), ?any=3,4 (in at least
+    one), ?exclude=5, in any combination. Cursor paginated by book id, with
+    the total and the number of matching books in each genre (facets).
+    """
+    page_size = BookPagination.page_size
+
+    def get(self, request, format=None):
+        try:
+            all_of, any_of, none_of = (_genre_ids(request, param) for param in ('all', 'any', 'exclude'))
+        except ValueError:
+            return Response({'error': 'Genre ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            matched = genre_index.match(all_of, any_of, none_of)
+        except KeyError:
+            return Response({'error': 'Genre not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        after = None
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            [after] = decode_cursor(cursor, [Book._meta.pk])
+            if after < 0:
+                raise NotFound('Invalid cursor.')
+        # One extra id to know whether there is a next page.
+        ids = bitmap_ids(matched, after, self.page_size + 1)
+        next_link = None
+        if len(ids) > self.page_size:
+            ids = ids[:self.page_size]
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(ids[-1:]))
+
+        rows = book_rows.for_request(request)
+        books = rows.values(Book.objects.filter(pk__in=ids).order_by('id'))
+        names = genre_index.genres()
+        facets = sorted(genre_index.facets(matched).items(), key=lambda item: (-item[1], item[0]))
+        return Response({
+            'count': matched.bit_count(),
+            'next': next_link,
+            'facets': [{'id': genre_id, 'name': names.get(genre_id), 'count': count} for genre_id, count in facets],
+            'results': rows.map(books),
+        }, status=status.HTTP_200_OK)
 
-        chapters = Chapter.objects.all().order_by('-lastupdated')
-        for chapter in chapters:
-            if chapter.book not in books:
-                books.append(chapter.book)
-            if len(books) >= 10:
-                break
 
-        book_serializer = BookSerializer(books, many=True)
-        return Response(book_serializer.data, status=status.HTTP_200_OK)
+class GetRecentUpdatesView(views.APIView):
+    pagination_class = RecentUpdatesPagination
+
+    def get(self, request, format=None):
+        rows = book_rows.for_request(request)
+        books = rows.values(Book.objects.filter(stats__latest_chapter_update__isnull=False))
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(books, request, view=self)
+        return paginator.get_paginated_response(rows.map(page))
 
 # class BookCreate(APIView):
 #     def post(self, request, format=None):
@@ -99,11 +99,112 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Same output as rest_framework.renderers.JSONRenderer, encoded with orjson when installed.
+    'DEFAULT_RENDERER_CLASSES': (
+        'bookly.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 18,
 }
 
 
+# Homepage snapshot
+# Snapshots are marked stale on writes and rebuilt in the background; this
+# bounds how long an unchanged snapshot is served (seconds).
+
+HOMEPAGE_SNAPSHOT_MAX_AGE = 300
+
+# The spotlight samples from an in-memory list of book ids, reloaded from the
+# database at most this often (seconds).
+
+SPOTLIGHT_RELOAD_INTERVAL = 600
+
+
+# Trending
+# Reads are counted in hourly buckets for the last TRENDING_HOURLY_WINDOW_HOURS
+# and daily buckets up to TRENDING_DAILY_WINDOW_DAYS, each bucket's weight
+# halving every TRENDING_HALF_LIFE_HOURS. `manage.py refresh_trending` keeps
+# the top TRENDING_LIST_SIZE books overall and per genre.
+
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_HOURLY_WINDOW_HOURS = 48
+TRENDING_DAILY_WINDOW_DAYS = 30
+TRENDING_LIST_SIZE = 100
+
+
+# Chapter view buffer
+# Chapter reads are queued in memory and written to History in batches every
+# VIEW_BUFFER_FLUSH_INTERVAL seconds (0 writes every read immediately) or
+# once VIEW_BUFFER_MAX_SIZE reads are waiting. A reader opening the same
+# chapter again within VIEW_DEBOUNCE_SECONDS is not counted twice.
+
+VIEW_BUFFER_FLUSH_INTERVAL = 5
+VIEW_BUFFER_MAX_SIZE = 500
+VIEW_DEBOUNCE_SECONDS = 300
+
+# Guest History rows older than this many days are deleted once `manage.py rollup_views`
+# has folded them into the daily view counts.
+
+HISTORY_GUEST_RETENTION_DAYS = 30
+
+# How long the shared table of contents of a book (chapters and their view
+# counts) is cached; per-user read marks are always fresh.
+
+BOOK_TOC_CACHE_SECONDS = 60
+
+# Cursor-paginated lists answer ?count=estimate with an exact count up to this
+# many rows (the planner's estimate on PostgreSQL).
+
+PAGINATION_COUNT_LIMIT = 1000
+
+# Endpoints that support ?stream=1 read and render this many rows at a time.
+
+STREAMING_CHUNK_SIZE = 500
+
+# Full-text search (SQLite FTS5 or PostgreSQL tsvector, see bookly.search).
+# Indexing chapter text makes chapter saves and the index much bigger, run
+# `manage.py reindex_search` after turning it on.
+
+SEARCH_INDEX_CHAPTERS = False
+SEARCH_RESULT_LIMIT = 50
+
+# Results of the most recent SEARCH_CACHE_SIZE distinct queries (after
+# normalization) are kept in memory for SEARCH_CACHE_SECONDS. Local saves
+# refresh them at once, saves made by other processes after the timeout.
+
+SEARCH_CACHE_SIZE = 1000
+SEARCH_CACHE_SECONDS = 300
+
+# Search-box suggestions come from an in-memory index of titles and author
+# names (bookly.suggest). It keeps at most SUGGEST_MAX_ENTRIES keys, the
+# most popular titles first; one million is roughly 60 MB per process.
+# Popularity weights are refreshed every SUGGEST_RELOAD_INTERVAL seconds.
+
+SUGGEST_MAX_ENTRIES = 1000000
+SUGGEST_MAX_RESULTS = 20
+SUGGEST_RELOAD_INTERVAL = 600
+
+# Genre browsing intersects in-memory bitmaps of each genre's books
+# (bookly.genres), reloaded from the database this often.
+
+GENRE_INDEX_RELOAD_INTERVAL = 600
+
+# Chapter text is split into pages of at most about CHAPTER_PAGE_CHARS
+# characters when it is saved, served one at a time with ?page=N. Run
+# `manage.py chapter_storage --repaginate` after changing these.
+
+CHAPTER_PAGE_CHARS = 3000
+CHAPTER_READING_WPM = 200
+
+# Chapters imported at once from a text, Markdown or EPUB file, with
+# `manage.py import_book` or POST book/<id>/import (bookly.importer), and
+# the bytes of text read from that file, after decompression for EPUB.
+
+IMPORT_MAX_CHAPTERS = 5000
+IMPORT_MAX_SIZE = 50 * 1024 * 1024
+
+
 # SIMPLE_JWT
 
 SIMPLE_JWT = {